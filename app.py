@@ -1,15 +1,35 @@
 import os
-from flask import Flask, render_template, redirect, url_for, request, flash, session, send_file
-from models import db, User, Team, Player # Keep your existing models import
+import re
+from flask import Flask, render_template, redirect, url_for, request, flash, session, send_file, Response, stream_with_context, jsonify, abort
+from models import db, User, Team, Player, AuctionState, AuctionEvent, LedgerSnapshot, League, Season # Keep your existing models import
+import auction_state
+from auction_state import AuctionStateConflict
+from events import broker
+from page_cache import cached_page
+import auctioneer
+from auctioneer import ActionRejected, STATE_CONFLICT_MSG, team_payload
+import exports
+import player_listing
+from player_listing import InvalidListing
+from auth import hasher, limiter, principals, check_user_password, AuthBusy
+import ledger
+from ledger import NothingToUndo
+import stats
+import roster_import
+from assets import assets
+from metrics import metrics
+from compression import compressor
+from tenancy import tenancy
+import click
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
 import datetime
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from functools import wraps
-import random
 from flask import send_file # Add or ensure this is present
-import pandas as pd
 import io
-from sqlalchemy import inspect # Needed for checking if tables exist
+from sqlalchemy import inspect, or_, text, update # Needed for checking if tables exist / bulk updates / schema upgrades
+from sqlalchemy.schema import CreateIndex
 
 # Load environment variables
 load_dotenv()
@@ -20,7 +40,68 @@ app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///project.db')
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'a_very_secret_key_to_change_later_98765') # Use environment variable or fallback
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Seconds a worker trusts its cached auction state before re-checking the version in the DB
+app.config['AUCTION_STATE_TTL'] = float(os.environ.get('AUCTION_STATE_TTL', '1.0'))
+# Defaults for new seasons (`flask create-league`, init-db); each season stores its own purse and squad size
+app.config['TEAM_PURSE'] = int(os.environ.get('TEAM_PURSE', '10000'))
+app.config['TEAM_SLOTS'] = int(os.environ.get('TEAM_SLOTS', '15'))
+# Leagues hosted by this deployment (see tenancy.py): the one served when a request names none, and the league/season table's cache lifetime
+app.config['DEFAULT_LEAGUE'] = os.environ.get('DEFAULT_LEAGUE', 'cpl')
+app.config['LEAGUE_NAME'] = os.environ.get('LEAGUE_NAME', 'Chidambaram Premier League') # Name of the league init-db seeds
+app.config['LEAGUE_CACHE_TTL'] = float(os.environ.get('LEAGUE_CACHE_TTL', '30'))
+# One connection pool per process, shared by every league; unset values keep SQLAlchemy's defaults
+engine_options = {'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '0') == '1'}
+for option, variable, cast in (('pool_size', 'DB_POOL_SIZE', int), ('max_overflow', 'DB_MAX_OVERFLOW', int),
+                               ('pool_timeout', 'DB_POOL_TIMEOUT', float), ('pool_recycle', 'DB_POOL_RECYCLE', int)):
+    if os.environ.get(variable): engine_options[option] = cast(os.environ[variable])
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+# Smallest raise (and opening bid) the control API's live bidding accepts
+app.config['AUCTION_BID_INCREMENT'] = int(os.environ.get('AUCTION_BID_INCREMENT', '10'))
+# Optional fixed seed for the per-round player draw order (reproducible rehearsals/audits)
+app.config['AUCTION_DRAW_SEED'] = os.environ.get('AUCTION_DRAW_SEED')
+# Shared directory for cross-worker event fan-out (gunicorn.conf.py makes one when running several workers)
+app.config['EVENTS_SOCKET_DIR'] = os.environ.get('EVENTS_SOCKET_DIR')
+# Rendered /, /teams and /players pages are cached per data version and audience (see page_cache.py)
+app.config['PAGE_CACHE_ENABLED'] = os.environ.get('PAGE_CACHE_ENABLED', '1') == '1'
+# Password hashing runs on a bounded pool (see auth.py); changing the method rehashes users at their next login
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', '16'))
+app.config['PASSWORD_HASH_WAIT'] = float(os.environ.get('PASSWORD_HASH_WAIT', '5'))
+# Password attempts allowed per window; the per-IP limit is generous because captains share the venue Wi-Fi
+app.config['LOGIN_ATTEMPTS_PER_IP'] = int(os.environ.get('LOGIN_ATTEMPTS_PER_IP', '60'))
+app.config['LOGIN_ATTEMPTS_PER_USER'] = int(os.environ.get('LOGIN_ATTEMPTS_PER_USER', '5'))
+app.config['LOGIN_RATE_WINDOW'] = int(os.environ.get('LOGIN_RATE_WINDOW', '60'))
+# Reverse proxies in front of the app (1 on Render); their X-Forwarded-* headers give the real client address
+# that the per-IP limit keys on. Leave at 0 when clients connect directly, or they could spoof it
+app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', '0'))
+# Auction ledger: snapshot the Player/Team projection every N events so a rebuild replays at most N events
+app.config['LEDGER_SNAPSHOT_INTERVAL'] = int(os.environ.get('LEDGER_SNAPSHOT_INTERVAL', '100'))
+# Seconds a worker trusts its cached copy of a logged-in user (role, team) before re-reading it
+app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', '30'))
+# Opt-in request profiling (see metrics.py): per-route latency, SQL counts/time, render time and N+1 warnings
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '0') == '1'
+app.config['METRICS_N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('METRICS_N_PLUS_ONE_THRESHOLD', '5'))
+# Response compression (see compression.py): gzip, or Brotli when installed, for text responses of at least COMPRESSION_MIN_SIZE bytes
+app.config['COMPRESSION_ENABLED'] = os.environ.get('COMPRESSION_ENABLED', '1') == '1'
+app.config['COMPRESSION_MIN_SIZE'] = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+app.config['COMPRESSION_GZIP_LEVEL'] = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+app.config['COMPRESSION_BROTLI_QUALITY'] = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5'))
+# Collapse indentation and blank lines in rendered HTML (outside <pre>, <textarea>, <script> and <style>)
+app.config['HTML_MINIFY'] = os.environ.get('HTML_MINIFY', '1') == '1'
+# Lets a Prometheus scraper read /metrics with "Authorization: Bearer <token>" instead of an admin login
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+if app.config['TRUSTED_PROXIES']:
+    proxies = app.config['TRUSTED_PROXIES']; app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
 db.init_app(app)
+broker.init_app(app)
+hasher.init_app(app)
+limiter.init_app(app)
+principals.init_app(app)
+tenancy.init_app(app)
+assets.init_app(app)
+metrics.init_app(app, db)
+compressor.init_app(app) # After metrics, so its after_request hook runs first and the sizes it records are measured
 
 # --- LOGIN MANAGER SETUP ---
 login_manager = LoginManager()
@@ -31,56 +112,168 @@ login_manager.login_message_category = 'error'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # A cached principal (id, username, name, role, team_id, league_id), not the User row; see auth.py
+    principal = principals.get(int(user_id))
+    # Admins and captains only exist in their own league; Super Admins (league_id None) in all of them
+    if principal is not None and principal.league_id not in (None, tenancy.current().league_id): return None
+    return principal
+
+@app.context_processor
+def inject_league_settings():
+    season = tenancy.current()
+    return {'season': season, 'leagues': [] if tenancy.host_bound() else tenancy.leagues(),
+            'team_purse': season.team_purse, 'team_slots': season.team_slots}
 
 # --- DATABASE CREATION & SEEDING ---
-@app.before_request
-def create_tables():
-    # Only run table creation/seeding logic once per app startup
-    if not hasattr(app, 'tables_created'):
-        with app.app_context():
-            inspector = db.inspect(db.engine)
-            tables_exist = inspector.has_table("user") # Check just one table
-
-            if not tables_exist:
-                db.create_all()
-                print("Database tables created.")
-                # --- Seed Super Admin ---
-                if User.query.count() == 0:
-                    print("Creating Super Admin...")
-                    super_admin = User( full_name="Super Admin", username="superadmin", role="Super Admin")
-                    super_admin.set_password("admin123")
-                    db.session.add(super_admin)
-                    db.session.commit()
-                    print("Super Admin created...")
-                # --- Seed Teams ---
-                if Team.query.count() == 0:
-                     teams = [ Team(team_name="Puthiya Sirakukal", captain_name="Govindaraj"), Team(team_name="APJ Tamizhan Youngstars", captain_name="Silambu R"), Team(team_name="Mighty Cricket Club", captain_name="Barathi K"), Team(team_name="SPARTAN ROCKERZ", captain_name="Barathi K"), Team(team_name="Crazy-11", captain_name="Nithyaraj"), Team(team_name="Jolly Players", captain_name="Vinoth"), Team(team_name="Dada Warriors", captain_name="Praveen prabhakaran"), Team(team_name="Thunder Strikers", captain_name="Gurunathan S") ]
-                     db.session.bulk_save_objects(teams); db.session.commit(); print(f"{len(teams)} teams seeded.")
-                # --- Seed Players (Corrected Indentation & Filenames) ---
-                if Player.query.count() == 0: # Only seed if player table is empty
-                    print("Attempting to seed players...")
-                    players_to_seed = [
-                        Player( player_name="Vasanth Ab", image_filename="vasanth_ab.png", cpl_2024_team="Crazy-11", cpl_2024_innings=8, cpl_2024_runs=302, cpl_2024_average=50.33, cpl_2024_sr=107.86, cpl_2024_hs=75, overall_matches=135, overall_runs=2813, overall_wickets=38, overall_bat_avg=25.81, overall_bowl_avg=21.61),
-                        Player( player_name="Mukil Hitman", image_filename="mukil_hitman.jpg", cpl_2024_team="Thunder Strikers", cpl_2024_innings=9, cpl_2024_runs=268, cpl_2024_average=29.78, cpl_2024_sr=120.18, cpl_2024_hs=46, overall_matches=263, overall_runs=7278, overall_wickets=99, overall_bat_avg=31.51, overall_bowl_avg=20.73),
-                        Player( player_name="M Govindaraj", image_filename="govindaraj.png", cpl_2024_team="Puthiya Sirakukal", cpl_2024_innings=6, cpl_2024_runs=223, cpl_2024_average=44.60, cpl_2024_sr=153.79, cpl_2024_hs=95, overall_matches=83, overall_runs=2098, overall_wickets=56, overall_bat_avg=29.14, overall_bowl_avg=15.32),
-                        Player( player_name="Nithesh Kumar", image_filename="nithesh_kumar.png", cpl_2024_team="APJ Tamizhan Youngstars", cpl_2024_innings=8, cpl_2024_runs=194, cpl_2024_average=24.25, cpl_2024_sr=125.16, cpl_2024_hs=87, overall_matches=220, overall_runs=3485, overall_wickets=77, overall_bat_avg=21.65, overall_bowl_avg=26.03),
-                        Player( player_name="Poovarasan", image_filename="poovarasan.png", cpl_2024_team="SPARTAN ROCKERZ", cpl_2024_innings=6, cpl_2024_runs=186, cpl_2024_average=31.00, cpl_2024_sr=137.78, cpl_2024_hs=63, overall_matches=237, overall_runs=5776, overall_wickets=157, overall_bat_avg=29.03, overall_bowl_avg=19.72),
-                        Player( player_name="R Raja", image_filename="r_raja.png", cpl_2024_team="APJ Tamizhan Youngstars", cpl_2024_innings=8, cpl_2024_runs=171, cpl_2024_average=21.38, cpl_2024_sr=133.59, cpl_2024_hs=61, overall_matches=118, overall_runs=1971, overall_wickets=49, overall_bat_avg=18.95, overall_bowl_avg=13.31),
-                        Player( player_name="Silambu R", image_filename="silambu_r.png", cpl_2024_team="APJ Tamizhan Youngstars", cpl_2024_innings=8, cpl_2024_runs=147, cpl_2024_average=24.50, cpl_2024_sr=125.64, cpl_2024_hs=46, overall_matches=109, overall_runs=1908, overall_wickets=147, overall_bat_avg=23.27, overall_bowl_avg=12.35),
-                        Player( player_name="Prabha", image_filename="prabha.png", cpl_2024_team="Jolly Players", cpl_2024_innings=6, cpl_2024_runs=136, cpl_2024_average=45.33, cpl_2024_sr=107.09, cpl_2024_hs=29, overall_matches=279, overall_runs=6883, overall_wickets=195, overall_bat_avg=35.48, overall_bowl_avg=13.39),
-                        Player( player_name="Hariharan R", image_filename="hariharan_r.png", cpl_2024_team="Thunder Strikers", cpl_2024_innings=9, cpl_2024_runs=130, cpl_2024_average=14.44, cpl_2024_sr=83.33, cpl_2024_hs=34, overall_matches=142, overall_runs=1984, overall_wickets=81, overall_bat_avg=17.71, overall_bowl_avg=18.36),
-                        Player( player_name="Ramesh G", image_filename=None, cpl_2024_team="APJ Tamizhan Youngstars", cpl_2024_innings=8, cpl_2024_runs=126, cpl_2024_average=18.00, cpl_2024_sr=104.13, cpl_2024_hs=39, overall_matches=87, overall_runs=1156, overall_wickets=46, overall_bat_avg=18.35, overall_bowl_avg=20.78),
-                    ]
-                    db.session.bulk_save_objects(players_to_seed)
-                    db.session.commit()
-                    print(f"{len(players_to_seed)} players seeded.")
-                # Removed the 'else' block that checked for missing players to simplify seeding logic
-                # Seeding now strictly happens only if the tables don't exist initially.
-
-            else: # If tables already exist
-                print("Database tables already exist.")
-        app.tables_created = True # Mark tables as created/checked for this app run
+# Indexes replaced by the season-leading ones in models.py; dropped from databases created before leagues existed
+OBSOLETE_INDEXES = ('ix_player_sort_runs', 'ix_player_sort_sr', 'ix_player_sort_wickets', 'ix_player_player_name',
+                    'ix_player_status', 'ix_ledger_snapshot_event_id')
+
+def upgrade_schema(connection):
+    # create_all() only adds missing tables: add missing columns, then missing indexes, to the existing ones
+    inspector = inspect(connection); preparer = connection.dialect.identifier_preparer
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                connection.execute(text(f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column.type.compile(connection.dialect)}'))
+                # Existing rows start at the column's default rather than NULL (e.g. counters that get incremented)
+                if column.default is not None and column.default.is_scalar: connection.execute(table.update().values({column.name: column.default.arg}))
+    # Team names are unique per season now; SQLite can't drop the old table-wide constraint without rebuilding the table
+    if connection.dialect.name != 'sqlite':
+        for constraint in inspector.get_unique_constraints('team'):
+            if constraint['column_names'] == ['team_name']: connection.execute(text(f'ALTER TABLE team DROP CONSTRAINT {preparer.quote(constraint["name"])}'))
+    for name in OBSOLETE_INDEXES: connection.execute(text(f'DROP INDEX IF EXISTS {preparer.quote(name)}'))
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes: connection.execute(CreateIndex(index, if_not_exists=True))
+
+def seed_league():
+    # The league and season this deployment served before it hosted several; returns the Season
+    league = League(slug=app.config['DEFAULT_LEAGUE'], name=app.config['LEAGUE_NAME'])
+    season = Season(league=league, name='2025', is_current=True, auction_date=datetime.date(2025, 12, 20), team_purse=app.config['TEAM_PURSE'],
+                    team_slots=app.config['TEAM_SLOTS'], max_players=120, stats_label='CPL 2024')
+    db.session.add(season); db.session.commit(); tenancy.invalidate()
+    print(f"League {league.name} ({league.slug}) created with season {season.name}.")
+    return season
+
+# Runs once per deployment (`flask --app app init-db`, the gunicorn on_starting hook or `python app.py`),
+# never inside a user's request
+def init_db():
+    with app.app_context():
+        inspector = db.inspect(db.engine)
+        tables_exist = inspector.has_table("user") # Check just one table
+
+        if not tables_exist:
+            db.create_all()
+            print("Database tables created.")
+            season = seed_league()
+            # --- Seed Super Admin ---
+            if User.query.count() == 0:
+                print("Creating Super Admin...")
+                super_admin = User( full_name="Super Admin", username="superadmin", role="Super Admin") # No league: manages all of them
+                super_admin.set_password("admin123")
+                db.session.add(super_admin)
+                db.session.commit()
+                print("Super Admin created...")
+            # --- Seed Teams ---
+            if Team.query.count() == 0:
+                 teams = [ Team(team_name="Puthiya Sirakukal", captain_name="Govindaraj"), Team(team_name="APJ Tamizhan Youngstars", captain_name="Silambu R"), Team(team_name="Mighty Cricket Club", captain_name="Barathi K"), Team(team_name="SPARTAN ROCKERZ", captain_name="Barathi K"), Team(team_name="Crazy-11", captain_name="Nithyaraj"), Team(team_name="Jolly Players", captain_name="Vinoth"), Team(team_name="Dada Warriors", captain_name="Praveen prabhakaran"), Team(team_name="Thunder Strikers", captain_name="Gurunathan S") ]
+                 for team in teams: team.season_id = season.id; team.purse = season.team_purse; team.slots_remaining = season.team_slots
+                 db.session.bulk_save_objects(teams); db.session.commit(); print(f"{len(teams)} teams seeded.")
+            # --- Seed Players (Corrected Indentation & Filenames) ---
+            if Player.query.count() == 0: # Only seed if player table is empty
+                print("Attempting to seed players...")
+                players_to_seed = [
+                    Player( season_id=season.id, player_name="Vasanth Ab", image_filename="vasanth_ab.png", cpl_2024_team="Crazy-11", cpl_2024_innings=8, cpl_2024_runs=302, cpl_2024_average=50.33, cpl_2024_sr=107.86, cpl_2024_hs=75, overall_matches=135, overall_runs=2813, overall_wickets=38, overall_bat_avg=25.81, overall_bowl_avg=21.61),
+                    Player( season_id=season.id, player_name="Mukil Hitman", image_filename="mukil_hitman.jpg", cpl_2024_team="Thunder Strikers", cpl_2024_innings=9, cpl_2024_runs=268, cpl_2024_average=29.78, cpl_2024_sr=120.18, cpl_2024_hs=46, overall_matches=263, overall_runs=7278, overall_wickets=99, overall_bat_avg=31.51, overall_bowl_avg=20.73),
+                    Player( season_id=season.id, player_name="M Govindaraj", image_filename="govindaraj.png", cpl_2024_team="Puthiya Sirakukal", cpl_2024_innings=6, cpl_2024_runs=223, cpl_2024_average=44.60, cpl_2024_sr=153.79, cpl_2024_hs=95, overall_matches=83, overall_runs=2098, overall_wickets=56, overall_bat_avg=29.14, overall_bowl_avg=15.32),
+                    Player( season_id=season.id, player_name="Nithesh Kumar", image_filename="nithesh_kumar.png", cpl_2024_team="APJ Tamizhan Youngstars", cpl_2024_innings=8, cpl_2024_runs=194, cpl_2024_average=24.25, cpl_2024_sr=125.16, cpl_2024_hs=87, overall_matches=220, overall_runs=3485, overall_wickets=77, overall_bat_avg=21.65, overall_bowl_avg=26.03),
+                    Player( season_id=season.id, player_name="Poovarasan", image_filename="poovarasan.png", cpl_2024_team="SPARTAN ROCKERZ", cpl_2024_innings=6, cpl_2024_runs=186, cpl_2024_average=31.00, cpl_2024_sr=137.78, cpl_2024_hs=63, overall_matches=237, overall_runs=5776, overall_wickets=157, overall_bat_avg=29.03, overall_bowl_avg=19.72),
+                    Player( season_id=season.id, player_name="R Raja", image_filename="r_raja.png", cpl_2024_team="APJ Tamizhan Youngstars", cpl_2024_innings=8, cpl_2024_runs=171, cpl_2024_average=21.38, cpl_2024_sr=133.59, cpl_2024_hs=61, overall_matches=118, overall_runs=1971, overall_wickets=49, overall_bat_avg=18.95, overall_bowl_avg=13.31),
+                    Player( season_id=season.id, player_name="Silambu R", image_filename="silambu_r.png", cpl_2024_team="APJ Tamizhan Youngstars", cpl_2024_innings=8, cpl_2024_runs=147, cpl_2024_average=24.50, cpl_2024_sr=125.64, cpl_2024_hs=46, overall_matches=109, overall_runs=1908, overall_wickets=147, overall_bat_avg=23.27, overall_bowl_avg=12.35),
+                    Player( season_id=season.id, player_name="Prabha", image_filename="prabha.png", cpl_2024_team="Jolly Players", cpl_2024_innings=6, cpl_2024_runs=136, cpl_2024_average=45.33, cpl_2024_sr=107.09, cpl_2024_hs=29, overall_matches=279, overall_runs=6883, overall_wickets=195, overall_bat_avg=35.48, overall_bowl_avg=13.39),
+                    Player( season_id=season.id, player_name="Hariharan R", image_filename="hariharan_r.png", cpl_2024_team="Thunder Strikers", cpl_2024_innings=9, cpl_2024_runs=130, cpl_2024_average=14.44, cpl_2024_sr=83.33, cpl_2024_hs=34, overall_matches=142, overall_runs=1984, overall_wickets=81, overall_bat_avg=17.71, overall_bowl_avg=18.36),
+                    Player( season_id=season.id, player_name="Ramesh G", image_filename=None, cpl_2024_team="APJ Tamizhan Youngstars", cpl_2024_innings=8, cpl_2024_runs=126, cpl_2024_average=18.00, cpl_2024_sr=104.13, cpl_2024_hs=39, overall_matches=87, overall_runs=1156, overall_wickets=46, overall_bat_avg=18.35, overall_bowl_avg=20.78),
+                ]
+                db.session.bulk_save_objects(players_to_seed)
+                db.session.commit()
+                print(f"{len(players_to_seed)} players seeded.")
+            # Removed the 'else' block that checked for missing players to simplify seeding logic
+            # Seeding now strictly happens only if the tables don't exist initially.
+
+        else: # If tables already exist
+            db.create_all() # Adds any tables introduced since the database was first created
+            with db.engine.begin() as connection: upgrade_schema(connection)
+            if Season.query.first() is None:
+                # Database from before leagues existed: everything in it belongs to the seeded league's season
+                season = seed_league()
+                for model in (Team, Player, AuctionState, AuctionEvent, LedgerSnapshot):
+                    db.session.execute(update(model).where(model.season_id.is_(None)).values(season_id=season.id))
+                db.session.execute(update(User).where(User.league_id.is_(None), User.role != 'Super Admin').values(league_id=season.league_id))
+                db.session.commit(); print("Existing teams, players and auction history moved into it.")
+            print("Database tables already exist.")
+        # Baseline for each season's auction ledger, so results recorded before it existed survive a rebuild
+        for season_id, in db.session.query(Season.id):
+            if LedgerSnapshot.query.filter_by(season_id=season_id).first() is None: ledger.take_snapshot(0, season_id)
+        db.session.commit()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the database tables and seed the initial data."""
+    init_db()
+
+@app.cli.command('build-assets')
+@click.option('--force', is_flag=True, help='Rebuild every variant, not just missing/outdated ones.')
+def build_assets_command(force):
+    """Create resized and WebP variants of the player images."""
+    print(f"{assets.build_variants(force=force)} image variants written.")
+
+@app.cli.command('create-league')
+@click.argument('slug')
+@click.argument('name')
+@click.option('--season', 'season_name', default=lambda: str(datetime.date.today().year), help='Season name (default: this year).')
+@click.option('--hostname', help='Serve this league on its own host name.')
+@click.option('--auction-date', type=click.DateTime(formats=['%Y-%m-%d']), help='YYYY-MM-DD, for the home page countdown.')
+@click.option('--purse', type=int, default=lambda: app.config['TEAM_PURSE'], help='Starting purse of every team.')
+@click.option('--slots', type=int, default=lambda: app.config['TEAM_SLOTS'], help='Squad size of every team.')
+@click.option('--max-players', type=int, default=120, help='Players the season can register.')
+@click.option('--stats-label', default='Last Season', help='Heading for the players\' previous-season stats.')
+@click.option('--team', 'teams', multiple=True, metavar='"NAME:CAPTAIN"', help='Add a team (repeatable).')
+def create_league_command(slug, name, season_name, hostname, auction_date, purse, slots, max_players, stats_label, teams):
+    """Add a league, or start a new current season of an existing one, with its teams."""
+    league = League.query.filter_by(slug=slug).first() or League(slug=slug, name=name)
+    if hostname: league.hostname = hostname.lower()
+    if league.id is not None and Season.query.filter_by(league_id=league.id, name=season_name).first():
+        raise click.ClickException(f'{slug} already has a season "{season_name}".')
+    if league.id is not None:
+        db.session.execute(update(Season).where(Season.league_id == league.id).values(is_current=False))
+    season = Season(league=league, name=season_name, is_current=True, auction_date=auction_date.date() if auction_date else None,
+                    team_purse=purse, team_slots=slots, max_players=max_players, stats_label=stats_label)
+    db.session.add(season); db.session.flush(); db.session.add(AuctionState(season_id=season.id))
+    for team in teams:
+        team_name, _, captain_name = team.partition(':')
+        db.session.add(Team(season_id=season.id, team_name=team_name.strip(), captain_name=captain_name.strip() or team_name.strip(), purse=purse, slots_remaining=slots))
+    db.session.flush(); ledger.take_snapshot(0, season.id); db.session.commit(); tenancy.invalidate()
+    print(f"{league.name} ({league.slug}) season {season.name} created with {len(teams)} teams.")
+
+@app.cli.command('import-players')
+@click.argument('path')
+@click.option('--dry-run', is_flag=True, help='Validate and report without saving.')
+@click.option('--league', help='League slug (default: DEFAULT_LEAGUE).')
+def import_players_command(path, dry_run, league):
+    """Import or update players of a league's current season from a CSV/XLSX roster file."""
+    with open(path, 'rb') as roster, tenancy.use(league):
+        report = roster_import.import_players(roster, path, dry_run=dry_run, actor='cli')
+    for row_number, message in report.errors: print(f"Row {row_number}: {message}")
+    print(f"{report.rows} rows, {report.inserted} new, {report.updated} updated, {report.error_count} errors, {'saved' if report.committed else 'nothing saved'}.")
+
+@app.cli.command('rebuild-projection')
+@click.option('--league', help='League slug (default: DEFAULT_LEAGUE).')
+def rebuild_projection_command(league):
+    """Recompute a league's player/team auction results from the auction ledger."""
+    with tenancy.use(league):
+        replayed = ledger.rebuild(); auction_state.touch(); db.session.commit()
+    print(f"Projection rebuilt ({replayed} events replayed since the last snapshot).")
 
 
 # --- CUSTOM DECORATORS for security ---
@@ -96,24 +289,54 @@ def role_required(role_names):
         return decorated_function
     return decorator
 
+def api_role_required(role_names):
+    # JSON counterpart of role_required for the control API: 401/403 bodies instead of redirects and flashes
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_user.is_authenticated: return jsonify({'error': 'Login required.'}), 401
+            if current_user.role != 'Super Admin' and current_user.role not in role_names: return jsonify({'error': 'You do not have permission to do this.'}), 403
+            # JSON bodies only, so a cross-site HTML form can't drive the auction with an admin's cookie
+            if request.method == 'POST' and not request.is_json: return jsonify({'error': 'Send a JSON body (Content-Type: application/json).'}), 415
+            if request.method == 'POST' and not isinstance(request.get_json(silent=True), dict): return jsonify({'error': 'The body must be a JSON object.'}), 400
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
 # --- Utility Function for Password Check ---
 def check_admin_password(username, password):
     user = User.query.filter_by(username=username).first()
     # Check if user exists, is Admin/SuperAdmin, and password matches
-    if user and (user.role == 'Admin' or user.role == 'Super Admin') and user.check_password(password):
+    if user and (user.role == 'Admin' or user.role == 'Super Admin') and check_user_password(user, password):
         return True
     return False
 
+# --- Utility Function for password confirmation of admin actions ---
+def confirm_password(user, password, invalid_msg):
+    # Returns the ActionRejected to report (its status matches /login's), or None when the password is correct
+    if not limiter.allow(request.remote_addr, user.username): return ActionRejected('Too many password attempts. Please wait a minute and try again.', 'error', 429)
+    account = db.session.get(User, user.id) # current_user is a cached principal without the password hash
+    try:
+        if account is None or not check_user_password(account, password): return ActionRejected(invalid_msg, 'error', 403)
+    except AuthBusy: return ActionRejected('The server is busy. Please try again in a moment.', 'error', 503)
+    limiter.reset_user(user.username)
+    return None
+
+# --- Utility Function for resetting auction data ---
+def reset_auction_data(season):
+    # Two set-based UPDATEs of the season's rows in the caller's transaction instead of loading and mutating every row
+    db.session.execute(update(Player).where(Player.season_id == season.id).values(status='Unsold', sold_price=0, team_id=None).execution_options(synchronize_session=False))
+    db.session.execute(update(Team).where(Team.season_id == season.id).values(purse=season.team_purse, purse_spent=0, players_taken_count=0, slots_remaining=season.team_slots).execution_options(synchronize_session=False))
+
 # --- PUBLIC ROUTES ---
 @app.route('/')
+@cached_page(per_day=True)
 def home():
-    player_count = Player.query.count()
-    team_count = Team.query.count()
-    slots_remaining = 120 - player_count
-    try:
-        auction_date_str = "2025-12-20"; auction_date = datetime.datetime.strptime(auction_date_str, "%Y-%m-%d").date(); today = datetime.date.today(); days_to_go = (auction_date - today).days
-        if days_to_go < 0: days_to_go = 0
-    except ValueError: days_to_go = 60
+    season = tenancy.current()
+    player_count = Player.query.filter_by(season_id=season.id).count()
+    team_count = Team.query.filter_by(season_id=season.id).count()
+    slots_remaining = max(season.max_players - player_count, 0)
+    days_to_go = max((season.auction_date - datetime.date.today()).days, 0) if season.auction_date else 0
     return render_template('index.html', active_page='home', player_count=player_count, team_count=team_count, slots_remaining=slots_remaining, days_to_go=days_to_go)
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -126,9 +349,14 @@ def login():
              return redirect(url_for('dashboard')) # Admins/Super Admins go to Dashboard
 
     if request.method == 'POST':
-        username = request.form.get('username'); password = request.form.get('password'); user = User.query.filter_by(username=username).first()
-        if user and user.check_password(password):
-            login_user(user); flash('Logged in successfully!', 'success')
+        username = request.form.get('username'); password = request.form.get('password')
+        if not limiter.allow(request.remote_addr, username): flash('Too many login attempts. Please wait a minute and try again.', 'error'); return render_template('login.html', active_page='login'), 429
+        user = User.query.filter_by(username=username).first()
+        if user is not None and user.league_id not in (None, tenancy.current().league_id): user = None # Another league's login
+        try: valid = user is not None and check_user_password(user, password)
+        except AuthBusy: flash('The server is busy verifying other logins. Please try again in a moment.', 'error'); return render_template('login.html', active_page='login'), 503
+        if valid:
+            limiter.reset_user(username); login_user(user); flash('Logged in successfully!', 'success')
             # Redirect based on role AFTER login
             if user.role == 'Captain':
                 return redirect(url_for('teams')) # Captains go to Teams page
@@ -140,7 +368,7 @@ def login():
 @app.route('/logout')
 @login_required
 def logout():
-    logout_user(); session.pop('auction_started', None); session.pop('current_player_id', None); session.pop('auction_round', None); session.pop('round_complete', None); session.pop('auction_complete', None); session.pop('auction_paused', None)
+    logout_user()
     flash('You have been logged out.', 'success'); return redirect(url_for('home'))
 
 # --- PROTECTED ROUTES ---
@@ -150,119 +378,140 @@ def logout():
 def dashboard():
     all_users = []
     if current_user.role == 'Super Admin':
-        all_users = User.query.filter(User.id != current_user.id).order_by(User.role, User.full_name).all()
-    return render_template('dashboard.html', active_page='dashboard', all_users=all_users)
+        league_users = or_(User.league_id == tenancy.current().league_id, User.league_id.is_(None))
+        all_users = User.query.filter(User.id != current_user.id, league_users).order_by(User.role, User.full_name).all()
+    return render_template('dashboard.html', active_page='dashboard', all_users=all_users,
+                           route_metrics=metrics.summary() if metrics.enabled else None)
+
+# Prometheus scrape endpoint for the opt-in request metrics (this worker's numbers)
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics.enabled: abort(404)
+    token = app.config['METRICS_TOKEN']
+    if not (token and request.headers.get('Authorization') == f'Bearer {token}'):
+        if not current_user.is_authenticated: return login_manager.unauthorized()
+        if current_user.role not in ('Admin', 'Super Admin'): abort(403)
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
+# Picks the league served to this browser (hosts bound to a league ignore it)
+@app.route('/leagues/<slug>')
+def switch_league(slug):
+    if slug not in {season.league_slug for season in tenancy.leagues()}: abort(404)
+    session['league'] = slug
+    return redirect(url_for('home'))
 
 
 @app.route('/players')
 @login_required
+@cached_page()
 def players():
-    all_players = Player.query.all()
-    return render_template('players.html', active_page='players', players=all_players)
+    # Only the first page is rendered; the template pulls the rest from /api/players as the visitor scrolls
+    first_page, next_cursor = player_listing.player_page()
+    return render_template('players.html', active_page='players', players=first_page, next_cursor=next_cursor)
+
+# --- PLAYER LISTING API ---
+@app.route('/api/players')
+@login_required
+def api_players():
+    # ?status=all|sold|unsold &team_id= &sort=name|runs|sr|wickets &order=asc|desc &limit= &cursor=
+    try:
+        page, next_cursor = player_listing.player_page(
+            status=request.args.get('status', 'all'), team_id=request.args.get('team_id', type=int),
+            sort=request.args.get('sort', 'name'), descending=request.args.get('order', 'asc') == 'desc',
+            limit=request.args.get('limit', player_listing.DEFAULT_LIMIT, type=int), cursor=request.args.get('cursor'))
+    except InvalidListing as e: return jsonify({'error': str(e)}), 400
+    return jsonify({'players': [player_listing.player_json(player) for player in page], 'next_cursor': next_cursor})
 
 # --- TEAMS ROUTE (PUBLIC) ---
 @app.route('/teams')
+@cached_page()
 def teams():
-    all_teams = Team.query.options(db.joinedload(Team.players)).all()
+    all_teams = Team.query.filter_by(season_id=tenancy.current().id).options(db.joinedload(Team.players)).all()
     return render_template('teams.html',
                            active_page='teams',
                            teams=all_teams,
+                           squad_stats=stats.current().team_summary(), # Precomputed squad totals
                            current_user=current_user) # Pass current_user
 
+# --- STATS API (PUBLIC) ---
+# Served from the in-memory stats board, which is updated from the auction ledger rather than per request
+@app.route('/api/stats/teams')
+def api_team_stats():
+    return jsonify({'teams': list(stats.current().team_summary().values())})
+
+@app.route('/api/stats/leaderboard/<stat>')
+def api_leaderboard(stat):
+    # ?status=all|sold|unsold &limit=
+    status = request.args.get('status', 'all')
+    if stat not in stats.LEADERBOARD_STATS: return jsonify({'error': f'Unknown stat "{stat}".'}), 400
+    if status not in ('all', 'sold', 'unsold'): return jsonify({'error': f'Unknown status "{status}".'}), 400
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+    return jsonify({'stat': stat, 'players': stats.current().leaderboard(stat, limit, status)})
+
 # --- AUCTION ROUTES (PUBLIC, content conditional) ---
+# Auction progress is server-side (see auction_state.py) so every viewer sees the same auction
 @app.route('/auctions')
 def auctions():
-    all_teams = Team.query.all()
-    auction_started = session.get('auction_started', False)
-    auction_round = session.get('auction_round', 1)
-    round_complete = session.get('round_complete', False)
-    auction_complete = session.get('auction_complete', False)
-    auction_paused = session.get('auction_paused', False)
-    current_player = None
-    next_round_players_count = 0
-
-    if auction_started and not round_complete and not auction_complete and not auction_paused:
-        player_id = session.get('current_player_id')
-        if player_id:
-            current_player = Player.query.get(player_id)
-            if current_player and current_player.status != 'Unsold':
-                 session.pop('current_player_id', None)
-                 # Redirect immediately only if user is admin to avoid loops for visitors
-                 if current_user.is_authenticated and current_user.role in ['Admin', 'Super Admin']:
-                    return redirect(url_for('next_player'))
-                 else:
-                    current_player = None # Clear player for non-admins
-
-    if round_complete:
-        next_round_status = f'Round {auction_round} Unsold'
-        next_round_players_count = Player.query.filter_by(status=next_round_status).count()
-        if next_round_players_count == 0:
-             auction_complete = True; auction_started = False
-             session['auction_complete'] = True; session['auction_started'] = False
-
+    state = auction_state.get_snapshot() # First, as it may commit (creating the season's state row) and expire loaded rows
+    all_teams = Team.query.filter_by(season_id=state.season_id).all()
     return render_template('auctions.html',
                            active_page='auctions', all_teams=all_teams,
-                           auction_started=auction_started, round_complete=round_complete,
-                           auction_complete=auction_complete, auction_paused=auction_paused,
-                           next_round_players_count=next_round_players_count,
-                           auction_round=auction_round, player=current_player,
+                           auction_started=state.started, round_complete=state.round_complete,
+                           auction_complete=state.complete, auction_paused=state.paused,
+                           next_round_players_count=state.next_round_players_count,
+                           auction_round=state.round, player=state.player if state.live else None,
+                           next_image=assets.player_image(state.next_image_filename) if state.live and state.next_player_id else None,
                            current_user=current_user) # Pass current_user
 
+# Server-Sent Events stream that lets /auctions and /teams update in place instead of refreshing
+@app.route('/auctions/events')
+def auction_events():
+    return Response(broker.stream(broker.subscribe(channel=tenancy.current().id)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 
+# Draw/sale/round logic lives in auctioneer.py, shared with the JSON control API below
 @app.route('/next_player')
 @login_required
 @role_required(['Admin'])
 def next_player():
-    if session.get('auction_paused'): flash('Auction is paused. Resume before proceeding.', 'warning'); return redirect(url_for('auctions'))
-    auction_round = session.get('auction_round', 1); current_round_status = 'Unsold'; next_round_status_check = f'Round {auction_round} Unsold'; unsold_players = Player.query.filter_by(status=current_round_status).all()
-    if not unsold_players:
-        players_for_next_round_count = Player.query.filter_by(status=next_round_status_check).count()
-        if players_for_next_round_count > 0: flash(f'Round {auction_round} complete. Ready for Round {auction_round + 1}.', 'info'); session['round_complete'] = True; session['auction_started'] = False; session.pop('current_player_id', None)
-        else: flash(f'Auction complete after Round {auction_round}! All players processed.', 'success'); session['auction_started'] = False; session['auction_complete'] = True; session.pop('current_player_id', None)
-        return redirect(url_for('auctions'))
-    random_player = random.choice(unsold_players); session['auction_started'] = True; session['current_player_id'] = random_player.id; session['round_complete'] = False; session['auction_complete'] = False
+    try: outcome = auctioneer.draw_next()
+    except ActionRejected as e: flash(str(e), e.category); return redirect(url_for('auctions'))
+    if outcome.message: flash(outcome.message, outcome.category)
     return redirect(url_for('auctions'))
 
 @app.route('/start_next_round')
 @login_required
 @role_required(['Admin'])
 def start_next_round():
-    auction_round = session.get('auction_round', 1); round_complete = session.get('round_complete', False)
-    if not round_complete: flash('Cannot start next round until the current one is complete.', 'warning'); return redirect(url_for('auctions'))
-    completed_round_status = f'Round {auction_round} Unsold'; players_for_next_round = Player.query.filter_by(status=completed_round_status).all()
-    if not players_for_next_round: flash('No players available for the next round.', 'info'); session['auction_complete'] = True; session['auction_started'] = False; session['round_complete'] = False; return redirect(url_for('auctions'))
-    for player in players_for_next_round: player.status = 'Unsold'
-    db.session.commit(); next_round_number = auction_round + 1; session['auction_round'] = next_round_number; session['round_complete'] = False; session['auction_started'] = True; session['auction_paused'] = False
-    flash(f'Starting Round {next_round_number}!', 'success'); return redirect(url_for('next_player'))
+    try: outcome = auctioneer.start_next_round(current_user.username)
+    except ActionRejected as e: flash(str(e), e.category); return redirect(url_for('auctions'))
+    flash(outcome.message, outcome.category)
+    return redirect(url_for('next_player') if outcome.state.started else url_for('auctions'))
 
 
 @app.route('/sold/<int:player_id>', methods=['POST'])
 @login_required
 @role_required(['Admin'])
 def mark_sold(player_id):
-    if session.get('auction_paused'): flash('Auction is paused. Resume before marking player sold.', 'warning'); return redirect(url_for('auctions'))
-    player = Player.query.get_or_404(player_id);
-    if player.status != 'Unsold' or not session.get('auction_started') or session.get('current_player_id') != player_id: flash('This player is not currently up for auction or action already taken.', 'error'); return redirect(url_for('auctions'))
     try: team_id = int(request.form.get('team_id')); sold_price = int(request.form.get('sold_price'))
     except (ValueError, TypeError): flash('Invalid team or price.', 'error'); return redirect(url_for('auctions'))
-    team = Team.query.get_or_404(team_id)
-    if team.slots_remaining <= 0: flash(f'{team.team_name} has no remaining slots!', 'error'); return redirect(url_for('auctions'))
-    if team.purse < sold_price: flash(f'{team.team_name} does not have enough purse (Remaining: {team.purse})!', 'error'); return redirect(url_for('auctions'))
-    player.status = 'Sold'; player.sold_price = sold_price; player.team_id = team.id; team.purse -= sold_price; team.purse_spent += sold_price; team.players_taken_count += 1; team.slots_remaining -= 1
-    db.session.commit(); flash(f'{player.player_name} sold to {team.team_name} for {sold_price} points!', 'success')
-    session.pop('current_player_id', None); return redirect(url_for('next_player'))
+    try: outcome = auctioneer.sell(player_id, team_id, sold_price, current_user.username)
+    except ActionRejected as e:
+        if e.status == 404: abort(404)
+        flash(str(e), e.category); return redirect(url_for('auctions'))
+    flash(outcome.message, outcome.category); return redirect(url_for('next_player'))
 
 
 @app.route('/unsold/<int:player_id>', methods=['POST'])
 @login_required
 @role_required(['Admin'])
 def mark_unsold(player_id):
-    if session.get('auction_paused'): flash('Auction is paused. Resume before marking player unsold.', 'warning'); return redirect(url_for('auctions'))
-    player = Player.query.get_or_404(player_id);
-    if player.status != 'Unsold' or not session.get('auction_started') or session.get('current_player_id') != player_id: flash('This player is not currently up for auction or action already taken.', 'error'); return redirect(url_for('auctions'))
-    auction_round = session.get('auction_round', 1); player.status = f'Round {auction_round} Unsold'; flash_msg = f'{player.player_name} marked as unsold for Round {auction_round}. Available in next round.'
-    db.session.commit(); flash(flash_msg, 'info'); session.pop('current_player_id', None)
-    return redirect(url_for('next_player'))
+    try: outcome = auctioneer.mark_unsold(player_id, current_user.username)
+    except ActionRejected as e:
+        if e.status == 404: abort(404)
+        flash(str(e), e.category); return redirect(url_for('auctions'))
+    flash(outcome.message, outcome.category); return redirect(url_for('next_player'))
 
 
 @app.route('/restart_auction', methods=['GET', 'POST'])
@@ -272,14 +521,14 @@ def restart_auction():
     if request.method == 'POST':
         if not current_user.is_authenticated: flash('Authentication error. Please log in again.', 'error'); return redirect(url_for('login'))
         password = request.form.get('password')
-        if not password or not current_user.check_password(password): flash('Invalid admin password. Auction not reset.', 'error'); return render_template('restart_confirm.html', active_page='auctions')
+        error = confirm_password(current_user, password, 'Invalid admin password. Auction not reset.')
+        if error: flash(str(error), error.category); return render_template('restart_confirm.html', active_page='auctions')
+        season = tenancy.current()
         try:
-            players_to_reset = Player.query.all();
-            for player in players_to_reset: player.status = 'Unsold'; player.sold_price = 0; player.team_id = None
-            teams_to_reset = Team.query.all();
-            for team in teams_to_reset: team.purse = 10000; team.purse_spent = 0; team.players_taken_count = 0; team.slots_remaining = 15
-            db.session.commit()
-            session.pop('auction_started', None); session.pop('current_player_id', None); session.pop('auction_round', None); session.pop('round_complete', None); session.pop('auction_complete', None); session.pop('auction_paused', None)
+            reset_auction_data(season)
+            auction_state.transition(auction_state.get_snapshot(fresh=True), data_changed=True, **auction_state.reset_values())
+            ledger.record('reset', actor=current_user.username, detail={'purse': season.team_purse, 'slots': season.team_slots})
+            db.session.commit(); auction_state.refresh(); broker.publish('reset', channel=season.id)
             flash('Auction has been reset!', 'success'); return redirect(url_for('auctions'))
         except Exception as e: db.session.rollback(); flash(f'An error occurred while resetting the auction: {e}', 'error'); return redirect(url_for('auctions'))
     return render_template('restart_confirm.html', active_page='auctions')
@@ -289,92 +538,205 @@ def restart_auction():
 @login_required
 @role_required(['Admin'])
 def pause_auction():
-    if not session.get('auction_started', False) or session.get('auction_complete', False): flash('Auction is not currently running or is already complete.', 'warning'); return redirect(url_for('auctions'))
-    session['auction_paused'] = True; flash('Auction paused.', 'info'); return redirect(url_for('auctions'))
+    try: outcome = auctioneer.pause(current_user.username); flash(outcome.message, outcome.category)
+    except ActionRejected as e: flash(str(e), e.category)
+    return redirect(url_for('auctions'))
 
 @app.route('/resume_auction', methods=['GET', 'POST'])
 @login_required
 @role_required(['Admin'])
 def resume_auction():
-    if not session.get('auction_paused', False): flash('Auction is not paused.', 'warning'); return redirect(url_for('auctions'))
+    state = auction_state.get_snapshot(fresh=True)
+    if not state.paused: flash('Auction is not paused.', 'warning'); return redirect(url_for('auctions'))
     if request.method == 'POST':
         if not current_user.is_authenticated: flash('Authentication error. Please log in again.', 'error'); return redirect(url_for('login'))
         password = request.form.get('password')
-        if not password or not current_user.check_password(password): flash('Invalid admin credentials. Auction not resumed.', 'error'); return render_template('resume_confirm.html', active_page='auctions')
-        session['auction_paused'] = False; flash('Auction resumed.', 'success')
-        if session.get('current_player_id'): return redirect(url_for('auctions'))
+        error = confirm_password(current_user, password, 'Invalid admin credentials. Auction not resumed.')
+        if error: flash(str(error), error.category); return render_template('resume_confirm.html', active_page='auctions')
+        try: outcome = auctioneer.resume(current_user.username)
+        except ActionRejected as e: flash(str(e), e.category); return redirect(url_for('auctions'))
+        flash(outcome.message, outcome.category)
+        if outcome.state.current_player_id: return redirect(url_for('auctions'))
         else: return redirect(url_for('next_player'))
     return render_template('resume_confirm.html', active_page='auctions')
 
+@app.route('/undo_last_sale', methods=['POST'])
+@login_required
+@role_required(['Admin'])
+def undo_last_sale():
+    # Reverses only the latest sale (one ledger lookup and two row updates); the player is auctioned again next
+    state = auction_state.get_snapshot(fresh=True)
+    try:
+        sale = ledger.undo_last_sale(actor=current_user.username)
+        if state.draw_order:
+            order = list(state.draw_order); order.insert(state.draw_position, sale.player_id)
+            auction_state.transition(state, data_changed=True, draw_order=auction_state.encode_order(order))
+        else: auction_state.transition(state, data_changed=True) # Picked up by the next draw's top-up
+        db.session.commit()
+    except NothingToUndo: db.session.rollback(); flash('There is no sale to undo since the last reset.', 'warning'); return redirect(url_for('auctions'))
+    except AuctionStateConflict: db.session.rollback(); auction_state.refresh(); flash(STATE_CONFLICT_MSG, 'warning'); return redirect(url_for('auctions'))
+    auction_state.refresh(); player = db.session.get(Player, sale.player_id); team = db.session.get(Team, sale.team_id)
+    broker.publish('sale_undone', {'player_id': player.id, 'player_name': player.player_name, 'price': sale.amount, 'team': team_payload(team)}, channel=state.season_id)
+    flash(f'Sale of {player.player_name} to {team.team_name} for {sale.amount} points undone. They will be auctioned again.', 'success')
+    return redirect(url_for('auctions'))
+
+
+# --- AUCTIONEER CONTROL API ---
+# One JSON request per action, answered with the new auction state, for bidding consoles.
+# Sold/unsold draw the next player in the same request unless {"advance": false}.
+def api_outcome(outcome, advance=False):
+    messages = [outcome.message] if outcome.message else []
+    if advance:
+        try: outcome = auctioneer.draw_next()
+        except ActionRejected as e: messages.append(str(e))
+        else:
+            if outcome.message: messages.append(outcome.message)
+    return jsonify({'messages': messages, 'state': auctioneer.state_json(outcome.state)})
+
+def api_int(data, key, default=None):
+    value = data.get(key, default)
+    if value is None or isinstance(value, int) and not isinstance(value, bool): return value
+    raise ActionRejected(f'"{key}" must be an integer.', 'error', 400)
+
+@app.errorhandler(ActionRejected)
+def action_rejected(e):
+    # Only the control API lets these escape; the HTML routes turn them into flashes
+    return jsonify({'error': str(e), 'state': auctioneer.state_json(auction_state.get_snapshot())}), e.status
+
+@app.route('/api/auction/state')
+@api_role_required(['Admin'])
+def api_auction_state():
+    return jsonify({'messages': [], 'state': auctioneer.state_json(auction_state.get_snapshot())})
+
+@app.route('/api/auction/next', methods=['POST'])
+@api_role_required(['Admin'])
+def api_auction_next():
+    return api_outcome(auctioneer.draw_next())
+
+@app.route('/api/auction/next_round', methods=['POST'])
+@api_role_required(['Admin'])
+def api_auction_next_round():
+    outcome = auctioneer.start_next_round(current_user.username)
+    return api_outcome(outcome, advance=outcome.state.started)
+
+@app.route('/api/auction/bid', methods=['POST'])
+@api_role_required(['Admin'])
+def api_auction_bid():
+    # {"team_id": 3, "amount": 250} or {"team_id": 3, "increment": 50}; without either, raises by AUCTION_BID_INCREMENT
+    data = request.get_json()
+    if api_int(data, 'team_id') is None: raise ActionRejected('"team_id" is required.', 'error', 400)
+    return api_outcome(auctioneer.bid(api_int(data, 'team_id'), amount=api_int(data, 'amount'), increment=api_int(data, 'increment')))
+
+@app.route('/api/auction/sold', methods=['POST'])
+@api_role_required(['Admin'])
+def api_auction_sold():
+    # Defaults: the player on the block, sold to the highest bid; the leading amount is only the default for the team that bid it
+    data = request.get_json(); state = auction_state.get_snapshot(fresh=True)
+    team_id = api_int(data, 'team_id', state.bid_team_id); sold_price = api_int(data, 'sold_price', state.bid_amount if team_id == state.bid_team_id else None)
+    if team_id is None: raise ActionRejected('No bid yet: send "team_id" and "sold_price".', 'error', 400)
+    if sold_price is None: raise ActionRejected('"sold_price" is required unless selling to the highest bidder.', 'error', 400)
+    outcome = auctioneer.sell(api_int(data, 'player_id', state.current_player_id), team_id, sold_price, current_user.username)
+    return api_outcome(outcome, advance=data.get('advance', True))
+
+@app.route('/api/auction/unsold', methods=['POST'])
+@api_role_required(['Admin'])
+def api_auction_unsold():
+    data = request.get_json(); state = auction_state.get_snapshot(fresh=True)
+    outcome = auctioneer.mark_unsold(api_int(data, 'player_id', state.current_player_id), current_user.username)
+    return api_outcome(outcome, advance=data.get('advance', True))
+
+@app.route('/api/auction/pause', methods=['POST'])
+@api_role_required(['Admin'])
+def api_auction_pause():
+    return api_outcome(auctioneer.pause(current_user.username))
+
+@app.route('/api/auction/resume', methods=['POST'])
+@api_role_required(['Admin'])
+def api_auction_resume():
+    # Same password confirmation as the resume page: {"password": "..."}
+    password = request.get_json().get('password')
+    if not isinstance(password, str): raise ActionRejected('"password" is required.', 'error', 400)
+    error = confirm_password(current_user, password, 'Invalid admin credentials. Auction not resumed.')
+    if error: raise error
+    outcome = auctioneer.resume(current_user.username)
+    return api_outcome(outcome, advance=not outcome.state.current_player_id)
+
 
 # --- ADMIN & SUPER ADMIN ROUTES ---
 @app.route('/create_user', methods=['GET', 'POST'])
 @login_required
 @role_required(['Admin'])
 def create_user():
-    teams = Team.query.all()
+    season = tenancy.current()
+    teams = Team.query.filter_by(season_id=season.id).all()
     if request.method == 'POST':
         full_name = request.form.get('full_name'); username = request.form.get('username'); password = request.form.get('password'); role = request.form.get('role'); team_id = request.form.get('team_id')
         if current_user.role == 'Admin' and role in ['Super Admin', 'Admin']:
              flash('Admins can only create Captains.', 'error'); return redirect(url_for('create_user'))
         existing_user = User.query.filter_by(username=username).first()
         if existing_user: flash(f'Username "{username}" already exists.', 'error'); return redirect(url_for('create_user'))
-        new_user = User(full_name=full_name, username=username, role=role, team_id=int(team_id) if team_id and role == 'Captain' else None)
-        new_user.set_password(password); db.session.add(new_user); db.session.commit()
+        new_user = User(full_name=full_name, username=username, role=role, team_id=int(team_id) if team_id and role == 'Captain' else None,
+                        league_id=None if role == 'Super Admin' else season.league_id)
+        new_user.set_password(password); db.session.add(new_user); db.session.commit(); principals.invalidate(new_user.id)
         flash(f'Login created for {full_name}!', 'success'); return redirect(url_for('dashboard'))
     return render_template('create_user.html', active_page='create_user', teams=teams)
 
-# --- EXPORT ROUTE ---
+# --- ROSTER IMPORT ROUTE ---
+@app.route('/import_players', methods=['GET', 'POST'])
+@login_required
+@role_required(['Admin'])
+def import_players():
+    report = None
+    if request.method == 'POST':
+        roster = request.files.get('roster')
+        if not roster or not roster.filename: flash('Choose a CSV or Excel file to import.', 'error'); return redirect(url_for('import_players'))
+        # Streamed straight from the upload; see roster_import.py
+        report = roster_import.import_players(roster.stream, roster.filename, dry_run=bool(request.form.get('dry_run')), actor=current_user.username)
+        if report.committed: flash(f'Imported {report.inserted} new and updated {report.updated} players.', 'success')
+    return render_template('import_players.html', active_page='dashboard', report=report)
+
+# --- EXPORT ROUTES ---
+# Files are built by exports.py and cached per auction data version, so repeat downloads are free
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' # Standard Excel MIME type
+
+def export_name(season):
+    # e.g. CPL_2025: the season title, safe for a Content-Disposition filename
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', season.title)
+
 @app.route('/export_team_excel/<int:team_id>')
 @login_required # User must be logged in
 def export_team_excel(team_id):
-    team = Team.query.get_or_404(team_id) # Get team or return 404 error if not found
-
-    # Security Check: User must be logged in (already handled by @login_required)
-    # No need for extra checks as all logged-in users can export per your last request
-
-    players_data = []
-    # Loop through players associated with the specific team
-    for player in team.players:
-        players_data.append({
-            'Player Name': player.player_name,
-            'Sold Price': player.sold_price,
-            'Overall Matches': player.overall_matches,
-            'Overall Runs': player.overall_runs,
-            'Overall Wickets': player.overall_wickets,
-            'Overall Bat Avg': player.overall_bat_avg,
-            'Overall Bowl Avg': player.overall_bowl_avg,
-            # Add more CPL 2024 stats if desired
-            'CPL 2024 Team': player.cpl_2024_team,
-            'CPL 2024 Innings': player.cpl_2024_innings,
-            'CPL 2024 Runs': player.cpl_2024_runs,
-            'CPL 2024 Average': player.cpl_2024_average,
-            'CPL 2024 SR': player.cpl_2024_sr,
-            'CPL 2024 HS': player.cpl_2024_hs,
-        })
+    season = tenancy.current()
+    team = Team.query.filter_by(id=team_id, season_id=season.id).first_or_404() # Get team or return 404 error if not found
 
     # Check if there's any data to export
-    if not players_data:
+    if not team.players_taken_count:
         flash(f"{team.team_name} has no players to export.", "info")
         return redirect(url_for('teams')) # Redirect back to the teams page
 
-    # Create a Pandas DataFrame
-    df = pd.DataFrame(players_data)
-
-    # Create an in-memory Excel file (BytesIO buffer)
-    output = io.BytesIO()
-    # Use context manager for ExcelWriter to ensure resources are managed
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name=team.team_name)
-    output.seek(0) # Go to the beginning of the buffer
+    version = auction_state.get_snapshot(fresh=True).data_version
+    data = exports.cached_workbook(('xlsx', season.id, team.id, version), [team], season.stats_label, summary=False)
+    return send_file(io.BytesIO(data), mimetype=XLSX_MIMETYPE,
+                     download_name=f'{team.team_name}_players.xlsx', as_attachment=True)
 
-    # Send the in-memory file to the user's browser as a download
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', # Standard Excel MIME type
-        download_name=f'{team.team_name}_players.xlsx', # Filename for the download
-        as_attachment=True # Tell the browser to download the file
-    )
+@app.route('/export_auction_excel')
+@login_required
+def export_auction_excel():
+    # Summary sheet plus one sheet per team
+    season = tenancy.current()
+    version = auction_state.get_snapshot(fresh=True).data_version
+    teams = Team.query.filter_by(season_id=season.id).order_by(Team.team_name).all()
+    data = exports.cached_workbook(('xlsx', season.id, 'all', version), teams, season.stats_label)
+    return send_file(io.BytesIO(data), mimetype=XLSX_MIMETYPE, download_name=f'{export_name(season)}_auction.xlsx', as_attachment=True)
+
+@app.route('/export_auction_csv')
+@login_required
+def export_auction_csv():
+    # Streamed row batch by row batch rather than built in memory first
+    season = tenancy.current()
+    version = auction_state.get_snapshot(fresh=True).data_version
+    return Response(stream_with_context(exports.stream_csv(('csv', season.id, 'all', version), season)), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={export_name(season)}_auction.csv'})
 
 # --- NEW ROUTE TO EDIT USER ---
 @app.route('/edit_user/<int:user_id>', methods=['GET', 'POST'])
@@ -382,7 +744,8 @@ def export_team_excel(team_id):
 @role_required(['Super Admin']) # Only Super Admins can edit
 def edit_user(user_id):
     user_to_edit = User.query.get_or_404(user_id) # Find the user or show 404 error
-    teams = Team.query.all() # Get teams for the dropdown
+    season = tenancy.current()
+    teams = Team.query.filter_by(season_id=season.id).all() # Get this season's teams for the dropdown
 
     if request.method == 'POST':
         # Get data from the submitted form
@@ -403,6 +766,8 @@ def edit_user(user_id):
         user_to_edit.full_name = new_full_name
         user_to_edit.username = new_username
         user_to_edit.role = new_role
+        # Super Admins span every league; anyone else belongs to the one being managed
+        user_to_edit.league_id = None if new_role == 'Super Admin' else (user_to_edit.league_id or season.league_id)
         # Only set team if the role is Captain
         user_to_edit.team_id = int(new_team_id) if new_team_id and new_role == 'Captain' else None
 
@@ -413,6 +778,7 @@ def edit_user(user_id):
 
         try:
             db.session.commit() # Save the changes to the database
+            principals.invalidate(user_to_edit.id) # Role/team changes apply from the user's next request
             flash(f'User "{user_to_edit.full_name}" updated successfully!', 'success')
             return redirect(url_for('dashboard')) # Go back to the dashboard
         except Exception as e:
@@ -443,6 +809,7 @@ def delete_user(user_id):
 
         db.session.delete(user_to_delete)
         db.session.commit()
+        principals.invalidate(user_id)
         flash(f'User "{user_to_delete.username}" deleted successfully.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -452,4 +819,6 @@ def delete_user(user_id):
 # --- RUN THE APP ---
 # This should be the last part of your file
 if __name__ == '__main__':
+    init_db()
+    assets.build_variants()
     app.run(debug=True)
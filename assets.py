@@ -0,0 +1,116 @@
+import hashlib
+import os
+import threading
+from flask import request, url_for
+
+# Resized player-image variants: name -> max width in px (2x the largest CSS size they're shown at)
+VARIANTS = {'card': 440, 'thumb': 160}
+VARIANT_DIR = 'variants' # Generated under static/, never committed
+IMAGE_DIR = 'images'
+DEFAULT_IMAGE = 'default_player.png'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+WEBP_QUALITY = 80
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class AssetPipeline:
+    """Fingerprinted static URLs and pre-resized player images.
+
+    ``asset_url`` appends a short content hash (``?v=``) to static URLs; responses for
+    a URL whose hash matches the file on disk are marked immutable, so browsers stop
+    re-requesting style.css and player photos on every navigation. A changed file
+    gets a new hash and therefore a new URL.
+    """
+
+    def __init__(self):
+        self._digests = {} # path -> (mtime_ns, size, digest)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        app.add_template_global(self.asset_url)
+        app.add_template_global(self.player_image)
+        app.after_request(self._cache_headers)
+
+    def fingerprint(self, filename):
+        """Short content hash of a static file, or None if it doesn't exist."""
+        path = os.path.join(self.static_folder, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        cached = self._digests.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        with open(path, 'rb') as f:
+            digest = hashlib.md5(f.read(), usedforsecurity=False).hexdigest()[:12]
+        with self._lock:
+            self._digests[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def asset_url(self, filename):
+        digest = self.fingerprint(filename)
+        return url_for('static', filename=filename, v=digest) if digest else url_for('static', filename=filename)
+
+    def player_image(self, image_filename, variant='card'):
+        """URLs for a player's photo: {'src': fallback, 'webp': WebP variant or None}.
+
+        Falls back to the original upload when the variants haven't been built.
+        """
+        image_filename = image_filename or DEFAULT_IMAGE
+        stem = os.path.splitext(image_filename)[0]
+        resized = f'{VARIANT_DIR}/{variant}/{image_filename}'
+        webp = f'{VARIANT_DIR}/{variant}/{stem}.webp'
+        has_resized = self.fingerprint(resized) is not None
+        return {'src': self.asset_url(resized if has_resized else f'{IMAGE_DIR}/{image_filename}'),
+                'webp': self.asset_url(webp) if self.fingerprint(webp) else None}
+
+    def _cache_headers(self, response):
+        if request.endpoint == 'static' and response.status_code in (200, 304):
+            version = request.args.get('v')
+            if version and version == self.fingerprint(request.view_args['filename']):
+                response.cache_control.public = True
+                response.cache_control.max_age = IMMUTABLE_MAX_AGE
+                response.cache_control.immutable = True
+                response.cache_control.no_cache = None
+        return response
+
+    # --- Build step ---
+    def build_variants(self, force=False):
+        """Write every missing/outdated resized + WebP variant of static/images; returns the number written.
+
+        Needs Pillow; without it nothing is built and pages keep serving the originals.
+        """
+        try:
+            from PIL import Image # Deferred: only the build step needs Pillow
+        except ImportError:
+            print("Pillow is not installed; skipping image variants.")
+            return 0
+        source_dir = os.path.join(self.static_folder, IMAGE_DIR)
+        if not os.path.isdir(source_dir):
+            return 0
+        written = 0
+        for name in sorted(os.listdir(source_dir)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in IMAGE_EXTENSIONS:
+                continue
+            source = os.path.join(source_dir, name)
+            mtime = os.path.getmtime(source)
+            for variant, width in VARIANTS.items():
+                target_dir = os.path.join(self.static_folder, VARIANT_DIR, variant)
+                targets = list(dict.fromkeys([os.path.join(target_dir, name), os.path.join(target_dir, stem + '.webp')]))
+                if not force and all(os.path.exists(t) and os.path.getmtime(t) >= mtime for t in targets):
+                    continue
+                os.makedirs(target_dir, exist_ok=True)
+                with Image.open(source) as image:
+                    image.thumbnail((width, width * 4)) # Only ever shrinks; keeps the aspect ratio
+                    if ext.lower() in ('.jpg', '.jpeg') and image.mode not in ('RGB', 'L'):
+                        image = image.convert('RGB')
+                    for target in targets:
+                        if target.endswith('.webp'): image.save(target, quality=WEBP_QUALITY, method=6)
+                        else: image.save(target, optimize=True)
+                        written += 1
+        return written
+
+
+assets = AssetPipeline()
@@ -0,0 +1,196 @@
+import copy
+import random
+import threading
+import time
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from models import db, AuctionState, Player
+from tenancy import tenancy
+
+# Columns copied from the current Player so /auctions can render without touching the player table
+PLAYER_FIELDS = (
+    'id', 'player_name', 'image_filename',
+    'cpl_2024_team', 'cpl_2024_innings', 'cpl_2024_runs', 'cpl_2024_average', 'cpl_2024_sr', 'cpl_2024_hs',
+    'overall_matches', 'overall_runs', 'overall_wickets', 'overall_bat_avg', 'overall_bowl_avg',
+)
+
+
+class AuctionStateConflict(Exception):
+    """Raised when another admin/worker changed the auction state first."""
+
+
+class AuctionSnapshot:
+    """Immutable, in-process copy of the AuctionState row plus the data derived from it."""
+    __slots__ = ('state_id', 'season_id', 'started', 'paused', 'complete', 'round_complete', 'round', 'current_player_id',
+                 'version', 'data_version', 'player', 'next_round_players_count', 'draw_order', 'draw_position', 'draw_seed',
+                 'bid_team_id', 'bid_amount', 'bid_version', 'next_image_filename')
+
+    def __init__(self, row, player=None, next_round_players_count=0):
+        self.state_id = row.id
+        self.season_id = row.season_id
+        self.started = row.started
+        self.paused = row.paused
+        self.complete = row.complete
+        self.round_complete = row.round_complete
+        self.round = row.round
+        self.current_player_id = row.current_player_id
+        self.version = row.version
+        self.data_version = row.data_version
+        self.player = player
+        self.next_round_players_count = next_round_players_count
+        self.draw_order = decode_order(row.draw_order)
+        self.draw_position = row.draw_position
+        self.draw_seed = row.draw_seed
+        self.bid_team_id = row.bid_team_id
+        self.bid_amount = row.bid_amount
+        self.bid_version = row.bid_version
+        self.next_image_filename = None # Photo of the next draw, so pages can preload it
+
+    @property
+    def live(self):
+        # A player is on the block and bids can be taken
+        return self.started and not self.paused and not self.round_complete and not self.complete
+
+    @property
+    def next_player_id(self):
+        # Who the next draw will pick, if the round's queue has anyone left
+        if self.draw_position < len(self.draw_order):
+            return self.draw_order[self.draw_position]
+        return None
+
+
+# Each season (one per league) runs its own auction, with its own state row and cached snapshot
+_lock = threading.Lock()
+_snapshots = {} # season_id -> (AuctionSnapshot, monotonic time of the last version check)
+
+
+def _load_row(season_id):
+    row = AuctionState.query.filter_by(season_id=season_id).first()
+    if row is None:
+        try:
+            db.session.add(AuctionState(season_id=season_id))
+            db.session.commit()
+        except IntegrityError: # Another worker created it first
+            db.session.rollback()
+        row = AuctionState.query.filter_by(season_id=season_id).one()
+    return row
+
+
+def refresh():
+    """Reload the current season's state row (and its current player) into the process cache."""
+    season_id = tenancy.current().id
+    row = _load_row(season_id)
+    player = None
+    if row.current_player_id:
+        current = db.session.get(Player, row.current_player_id)
+        if current is not None:
+            player = {field: getattr(current, field) for field in PLAYER_FIELDS}
+    next_round_players_count = 0
+    if row.round_complete:
+        next_round_players_count = Player.query.filter_by(season_id=season_id, status=f'Round {row.round} Unsold').count()
+    snapshot = AuctionSnapshot(row, player, next_round_players_count)
+    if snapshot.next_player_id:
+        snapshot.next_image_filename = db.session.query(Player.image_filename).filter_by(id=snapshot.next_player_id).scalar()
+    with _lock:
+        _snapshots[season_id] = (snapshot, time.monotonic())
+    return snapshot
+
+
+def get_snapshot(fresh=False):
+    """Return the cached auction state of the current season.
+
+    Other workers may have moved the auction on, so once the cache is older than
+    AUCTION_STATE_TTL seconds a single primary-key lookup of ``version`` decides
+    whether a reload is needed. The same lookup picks up a new live bid, which only
+    replaces the bid fields. Write paths pass ``fresh=True`` to always check.
+    """
+    season_id = tenancy.current().id
+    snapshot, checked_at = _snapshots.get(season_id, (None, 0.0))
+    if snapshot is None:
+        return refresh()
+    now = time.monotonic()
+    if not fresh and now - checked_at < current_app.config['AUCTION_STATE_TTL']:
+        return snapshot
+    version, bid_version, bid_team_id, bid_amount = db.session.query(
+        AuctionState.version, AuctionState.bid_version, AuctionState.bid_team_id, AuctionState.bid_amount).filter_by(id=snapshot.state_id).one()
+    if version != snapshot.version:
+        return refresh()
+    if bid_version != snapshot.bid_version:
+        snapshot = copy.copy(snapshot)
+        snapshot.bid_version, snapshot.bid_team_id, snapshot.bid_amount = bid_version, bid_team_id, bid_amount
+    with _lock:
+        _snapshots[season_id] = (snapshot, now)
+    return snapshot
+
+
+def transition(snapshot, data_changed=False, **changes):
+    """Apply ``changes`` to the state row only if it is still at ``snapshot.version``.
+
+    Runs inside the caller's transaction so player/team updates and the state change
+    commit together; the caller commits and then calls ``refresh()``. A bid accepted
+    since ``snapshot`` is a conflict too, so a sale never acts on an outdated bid. Pass
+    ``data_changed=True`` when those updates alter players or teams, so the pages
+    and files cached per ``data_version`` are rebuilt. A change of current player
+    also clears the live bid.
+    """
+    if 'current_player_id' in changes:
+        changes.setdefault('bid_team_id', None); changes.setdefault('bid_amount', None)
+    if data_changed:
+        changes['data_version'] = AuctionState.data_version + 1
+    result = db.session.execute(
+        update(AuctionState)
+        .where(AuctionState.id == snapshot.state_id, AuctionState.version == snapshot.version, AuctionState.bid_version == snapshot.bid_version)
+        .values(version=AuctionState.version + 1, **changes)
+    )
+    if result.rowcount != 1:
+        raise AuctionStateConflict()
+
+
+def place_bid(snapshot, team_id, amount):
+    """Record the live bid if neither the auction nor the bid has moved since ``snapshot``.
+
+    Only ``bid_version`` is bumped, so the pages, exports and stats cached per
+    ``version``/``data_version`` survive a round of bidding.
+    """
+    result = db.session.execute(
+        update(AuctionState)
+        .where(AuctionState.id == snapshot.state_id, AuctionState.version == snapshot.version, AuctionState.bid_version == snapshot.bid_version)
+        .values(bid_team_id=team_id, bid_amount=amount, bid_version=AuctionState.bid_version + 1)
+    )
+    if result.rowcount != 1:
+        raise AuctionStateConflict()
+
+
+def touch():
+    """Bump the current season's version for data changes made outside an auction transition (seeding, imports)."""
+    db.session.execute(update(AuctionState).where(AuctionState.season_id == tenancy.current().id)
+                       .values(version=AuctionState.version + 1, data_version=AuctionState.data_version + 1))
+
+
+def reset_values():
+    # Column values for a brand new auction
+    return dict(started=False, paused=False, complete=False, round_complete=False, round=1, current_player_id=None,
+                draw_order=None, draw_position=0, draw_seed=None)
+
+
+# --- Draw order ---
+def encode_order(player_ids):
+    return ','.join(str(player_id) for player_id in player_ids)
+
+
+def decode_order(value):
+    return tuple(int(player_id) for player_id in value.split(',')) if value else ()
+
+
+def new_draw_seed():
+    # AUCTION_DRAW_SEED pins the seed (rehearsals/audits); otherwise pick one and persist it with the state
+    configured = current_app.config.get('AUCTION_DRAW_SEED')
+    return int(configured) if configured is not None else random.SystemRandom().randrange(2 ** 31)
+
+
+def build_draw_order(player_ids, seed, auction_round):
+    """Shuffle a round's player IDs reproducibly: same seed, round and ID set give the same order."""
+    order = sorted(player_ids)
+    random.Random(f'{seed}:{auction_round}').shuffle(order)
+    return order
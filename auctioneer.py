@@ -0,0 +1,203 @@
+from flask import current_app
+from sqlalchemy import update
+from models import db, Player, Team
+import auction_state
+from auction_state import AuctionStateConflict
+from assets import assets
+from events import broker
+from sales import apply_sale, SaleRejected
+from tenancy import tenancy
+import ledger
+import stats
+
+# Shared message when another admin moved the auction on between our read and write
+STATE_CONFLICT_MSG = 'The auction was updated by another admin. Please try again.'
+
+
+class ActionRejected(Exception):
+    """Raised when an auctioneer action doesn't apply to the auction as it stands.
+
+    The message is safe to show the admin; ``category`` is its flash category and
+    ``status`` the HTTP status the control API answers with.
+    """
+
+    def __init__(self, message, category='warning', status=409):
+        super().__init__(message)
+        self.category = category
+        self.status = status
+
+
+class Outcome:
+    """What an action did: the refreshed snapshot plus an optional message for the admin."""
+    __slots__ = ('state', 'message', 'category')
+
+    def __init__(self, state, message=None, category='info'):
+        self.state = state
+        self.message = message
+        self.category = category
+
+
+def team_payload(team):
+    return {'id': team.id, 'team_name': team.team_name, 'purse': team.purse, 'purse_spent': team.purse_spent,
+            'players_taken_count': team.players_taken_count, 'slots_remaining': team.slots_remaining}
+
+
+def _conflict(message=STATE_CONFLICT_MSG):
+    db.session.rollback(); auction_state.refresh()
+    return ActionRejected(message)
+
+
+# --- Actions ---
+# Each one validates against the cached snapshot, commits, refreshes the snapshot and publishes its live event.
+# The HTML routes turn the result into a flash and redirect; the control API returns the new state as JSON.
+def draw_next():
+    state = auction_state.get_snapshot(fresh=True)
+    if state.paused: raise ActionRejected('Auction is paused. Resume before proceeding.')
+    # Players are drawn from the round's pre-shuffled queue, so a draw is just "take the next ID"
+    auction_round = state.round; order = list(state.draw_order); position = state.draw_position; seed = state.draw_seed if state.draw_seed is not None else auction_state.new_draw_seed()
+    if state.current_player_id: order.append(state.current_player_id) # Skipped without a decision: back of the queue
+    if position >= len(order):
+        # Queue used up (or first draw): pick up any players still waiting in this round
+        unsold_ids = [player_id for (player_id,) in db.session.query(Player.id).filter_by(season_id=state.season_id, status='Unsold')]
+        order = auction_state.build_draw_order(unsold_ids, seed, auction_round); position = 0
+    draw_changes = dict(draw_seed=seed, draw_order=auction_state.encode_order(order)) if order != list(state.draw_order) else dict(draw_seed=seed)
+    message = None; category = 'info'
+    try:
+        if position >= len(order):
+            players_for_next_round_count = Player.query.filter_by(season_id=state.season_id, status=f'Round {auction_round} Unsold').count()
+            if players_for_next_round_count > 0:
+                auction_state.transition(state, round_complete=True, started=False, current_player_id=None, draw_order=None, draw_position=0, draw_seed=seed); event = 'round_complete'; message = f'Round {auction_round} complete. Ready for Round {auction_round + 1}.'
+            else:
+                auction_state.transition(state, complete=True, started=False, current_player_id=None, draw_order=None, draw_position=0, draw_seed=seed); event = 'auction_complete'; message = f'Auction complete after Round {auction_round}! All players processed.'; category = 'success'
+        else:
+            auction_state.transition(state, started=True, current_player_id=order[position], draw_position=position + 1, round_complete=False, complete=False, **draw_changes); event = 'player_up'
+        db.session.commit()
+    except AuctionStateConflict: raise _conflict()
+    state = auction_state.refresh()
+    images = dict(image=assets.player_image(state.player['image_filename']), next_image=assets.player_image(state.next_image_filename) if state.next_player_id else None) if state.player else {}
+    broker.publish(event, {'round': state.round, 'player': state.player, 'next_round_players_count': state.next_round_players_count, **images}, channel=state.season_id)
+    return Outcome(state, message, category)
+
+
+def start_next_round(actor):
+    state = auction_state.get_snapshot(fresh=True); auction_round = state.round
+    if not state.round_complete: raise ActionRejected('Cannot start next round until the current one is complete.')
+    completed_round_status = f'Round {auction_round} Unsold'; next_round_ids = [player_id for (player_id,) in db.session.query(Player.id).filter_by(season_id=state.season_id, status=completed_round_status)]
+    try:
+        if not next_round_ids:
+            auction_state.transition(state, complete=True, started=False, round_complete=False); db.session.commit()
+            return Outcome(auction_state.refresh(), 'No players available for the next round.')
+        db.session.execute(update(Player).where(Player.season_id == state.season_id, Player.status == completed_round_status).values(status='Unsold').execution_options(synchronize_session=False))
+        next_round_number = auction_round + 1; seed = state.draw_seed if state.draw_seed is not None else auction_state.new_draw_seed()
+        draw_order = auction_state.build_draw_order(next_round_ids, seed, next_round_number)
+        ledger.record('round_start', actor=actor, round=next_round_number)
+        auction_state.transition(state, data_changed=True, round=next_round_number, round_complete=False, started=True, paused=False, draw_order=auction_state.encode_order(draw_order), draw_position=0, draw_seed=seed)
+        db.session.commit()
+    except AuctionStateConflict: raise _conflict()
+    return Outcome(auction_state.refresh(), f'Starting Round {next_round_number}!', 'success')
+
+
+def _player_on_block(state, player_id, action):
+    if state.paused: raise ActionRejected(f'Auction is paused. Resume before marking player {action}.')
+    if player_id is None: raise ActionRejected('No player is up for auction.')
+    player = Player.query.filter_by(id=player_id, season_id=state.season_id).first()
+    if player is None: raise ActionRejected('Player not found.', 'error', 404)
+    if player.status != 'Unsold' or not state.started or state.current_player_id != player_id:
+        raise ActionRejected('This player is not currently up for auction or action already taken.', 'error')
+    return player
+
+
+def sell(player_id, team_id, sold_price, actor):
+    state = auction_state.get_snapshot(fresh=True)
+    player = _player_on_block(state, player_id, 'sold')
+    team = Team.query.filter_by(id=team_id, season_id=state.season_id).first()
+    if team is None: raise ActionRejected('Team not found.', 'error', 404)
+    # Purse/slot checks and the decrements happen atomically in guarded UPDATEs (see sales.py)
+    try:
+        apply_sale(player.id, team.id, sold_price); auction_state.transition(state, data_changed=True, current_player_id=None)
+        ledger.record('sold', actor=actor, player_id=player.id, team_id=team.id, amount=sold_price, round=state.round); db.session.commit()
+    except SaleRejected as e: db.session.rollback(); raise ActionRejected(str(e), 'error')
+    except AuctionStateConflict: raise _conflict()
+    state = auction_state.refresh()
+    broker.publish('sold', {'player_id': player.id, 'player_name': player.player_name, 'price': sold_price, 'team': team_payload(team)}, channel=state.season_id)
+    return Outcome(state, f'{player.player_name} sold to {team.team_name} for {sold_price} points!', 'success')
+
+
+def mark_unsold(player_id, actor):
+    state = auction_state.get_snapshot(fresh=True)
+    player = _player_on_block(state, player_id, 'unsold')
+    auction_round = state.round; player.status = f'Round {auction_round} Unsold'
+    try:
+        auction_state.transition(state, data_changed=True, current_player_id=None)
+        ledger.record('unsold', actor=actor, player_id=player.id, round=auction_round); db.session.commit()
+    except AuctionStateConflict: raise _conflict()
+    state = auction_state.refresh()
+    broker.publish('unsold', {'player_id': player.id, 'player_name': player.player_name, 'round': auction_round}, channel=state.season_id)
+    return Outcome(state, f'{player.player_name} marked as unsold for Round {auction_round}. Available in next round.')
+
+
+def pause(actor):
+    state = auction_state.get_snapshot(fresh=True)
+    if not state.started or state.complete: raise ActionRejected('Auction is not currently running or is already complete.')
+    try: auction_state.transition(state, paused=True); ledger.record('pause', actor=actor); db.session.commit()
+    except AuctionStateConflict: raise _conflict()
+    state = auction_state.refresh(); broker.publish('paused', channel=state.season_id)
+    return Outcome(state, 'Auction paused.')
+
+
+def resume(actor):
+    # The caller confirms the admin's password first
+    state = auction_state.get_snapshot(fresh=True)
+    if not state.paused: raise ActionRejected('Auction is not paused.')
+    try: auction_state.transition(state, paused=False); ledger.record('resume', actor=actor); db.session.commit()
+    except AuctionStateConflict: raise _conflict()
+    state = auction_state.refresh(); broker.publish('resumed', channel=state.season_id)
+    return Outcome(state, 'Auction resumed.', 'success')
+
+
+# --- Live bidding ---
+def team_limits():
+    """{team_id: (team_name, purse left, slots left)} for the current season, from the in-memory stats board."""
+    season = tenancy.current()
+    return {team_id: (team['team_name'], season.team_purse - team['purse_spent'], season.team_slots - team['players'])
+            for team_id, team in stats.current().team_summary().items()}
+
+
+def bid(team_id, amount=None, increment=None):
+    """Raise the live bid on the current player for a team.
+
+    Checked without a database read: the cached snapshot has the current bid and the
+    stats board has every team's purse and slots. Only an accepted bid writes, as one
+    guarded update of the bid columns, so two bids racing for the same amount can't
+    both win; it leaves the auction version alone, so cached pages stay valid. The
+    sale itself is still charged by ``sell`` with its own guarded UPDATEs.
+    """
+    state = auction_state.get_snapshot()
+    if not state.live or not state.current_player_id: raise ActionRejected('No player is up for bidding.')
+    step = current_app.config['AUCTION_BID_INCREMENT']
+    if amount is None: amount = (state.bid_amount or 0) + (increment or step)
+    minimum = state.bid_amount + step if state.bid_amount else step
+    if amount < minimum: raise ActionRejected(f'Bid must be at least {minimum}.', 'error', 400)
+    limits = team_limits().get(team_id)
+    if limits is None: raise ActionRejected('Team not found.', 'error', 404)
+    team_name, purse_left, slots_left = limits
+    if state.bid_team_id == team_id: raise ActionRejected(f'{team_name} already holds the highest bid.')
+    if slots_left <= 0: raise ActionRejected(f'{team_name} has no remaining slots!', 'error')
+    if amount > purse_left: raise ActionRejected(f'{team_name} does not have enough purse (Remaining: {purse_left})!', 'error')
+    try: auction_state.place_bid(state, team_id, amount); db.session.commit()
+    except AuctionStateConflict: raise _conflict('Another bid or action was accepted first. Please bid again.')
+    state = auction_state.refresh()
+    broker.publish('bid', {'player_id': state.current_player_id, 'team_id': team_id, 'team_name': team_name, 'amount': amount}, channel=state.season_id)
+    return Outcome(state)
+
+
+def state_json(state):
+    """The auction as the control API reports it after every action."""
+    limits = team_limits()
+    return {
+        'version': state.version, 'bid_version': state.bid_version, 'round': state.round, 'started': state.started, 'paused': state.paused,
+        'round_complete': state.round_complete, 'complete': state.complete, 'live': state.live,
+        'player': state.player, 'next_player_id': state.next_player_id, 'next_round_players_count': state.next_round_players_count,
+        'bid': {'team_id': state.bid_team_id, 'team_name': limits.get(state.bid_team_id, ('',))[0], 'amount': state.bid_amount} if state.bid_team_id else None,
+        'teams': [{'id': team_id, 'team_name': name, 'purse': purse, 'slots_remaining': slots} for team_id, (name, purse, slots) in limits.items()],
+    }
@@ -0,0 +1,201 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from werkzeug.security import check_password_hash, generate_password_hash
+from models import db, User
+
+
+class AuthBusy(Exception):
+    """Raised when every password-hashing slot is taken; the client should retry shortly."""
+
+
+class PasswordHasher:
+    """Runs the deliberately slow password hashes on a small, bounded thread pool.
+
+    At most PASSWORD_HASH_WORKERS hashes run at once and PASSWORD_HASH_QUEUE more may
+    wait, so a burst of logins costs a fixed amount of CPU instead of one hash per
+    request thread. Requests that cannot get a slot within PASSWORD_HASH_WAIT seconds
+    get AuthBusy rather than piling up.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._owner_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.wait = app.config['PASSWORD_HASH_WAIT']
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self._slots = threading.BoundedSemaphore(self.workers + app.config['PASSWORD_HASH_QUEUE'])
+
+    def _pool(self):
+        # Created lazily per process: threads do not survive gunicorn's fork of a preloaded app
+        with self._lock:
+            if self._owner_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+                self._owner_pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait):
+            raise AuthBusy()
+        try:
+            return self._pool().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+
+@lru_cache(maxsize=8)
+def hash_prefix(method):
+    # Werkzeug expands e.g. 'scrypt' to 'scrypt:32768:8:1'; hash once to learn the full parameter string
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def needs_rehash(password_hash, method):
+    return password_hash.split('$', 1)[0] != hash_prefix(method)
+
+
+hasher = PasswordHasher()
+
+
+def check_user_password(user, password):
+    """Verify ``user``'s password through the bounded pool.
+
+    On success, a hash made with older parameters (or another method) is transparently
+    replaced with one using the current PASSWORD_HASH_METHOD.
+    """
+    if not password or not hasher.verify(user.password_hash, password):
+        return False
+    if needs_rehash(user.password_hash, hasher.method):
+        user.password_hash = hasher.hash(password)
+        db.session.commit()
+    return True
+
+
+# --- Rate limiting ---
+class MemoryRateLimitStore:
+    """Fixed-window hit counters held in process memory.
+
+    Any object with the same ``hit``/``reset`` methods (for example one backed by a
+    local Redis shared by all workers) can be assigned to ``limiter.store`` instead.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, window):
+        now = time.monotonic()
+        with self._lock:
+            started, count = self._windows.get(key, (now, 0))
+            if now - started >= window:
+                started, count = now, 0
+            self._windows[key] = (started, count + 1)
+            if len(self._windows) > self.max_keys:
+                self._windows = {k: v for k, v in self._windows.items() if now - v[0] < window}
+            return count + 1
+
+    def reset(self, key):
+        with self._lock:
+            self._windows.pop(key, None)
+
+
+class RateLimiter:
+    """Caps password attempts per client IP and per username within a time window."""
+
+    def __init__(self, store=None):
+        self.store = store or MemoryRateLimitStore()
+
+    def init_app(self, app):
+        self.per_ip = app.config['LOGIN_ATTEMPTS_PER_IP']
+        self.per_user = app.config['LOGIN_ATTEMPTS_PER_USER']
+        self.window = app.config['LOGIN_RATE_WINDOW']
+
+    def allow(self, ip, username):
+        ip_hits = self.store.hit(('ip', ip), self.window)
+        user_hits = self.store.hit(('user', (username or '').lower()), self.window)
+        return ip_hits <= self.per_ip and user_hits <= self.per_user
+
+    def reset_user(self, username):
+        self.store.reset(('user', (username or '').lower()))
+
+
+limiter = RateLimiter()
+
+
+# --- Logged-in user principals ---
+class UserPrincipal:
+    """What a request needs to know about the logged-in user, detached from the database.
+
+    Flask-Login's ``current_user`` is one of these. Views that need the User row itself
+    (password checks, edits) load it by ``id``.
+    """
+    __slots__ = ('id', 'username', 'full_name', 'role', 'team_id', 'league_id', 'loaded_at')
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, user, loaded_at):
+        self.id = user.id
+        self.username = user.username
+        self.full_name = user.full_name
+        self.role = user.role
+        self.team_id = user.team_id
+        self.league_id = user.league_id
+        self.loaded_at = loaded_at
+
+    def get_id(self):
+        return str(self.id)
+
+
+class PrincipalCache:
+    """LRU of UserPrincipals by user id, each trusted for USER_CACHE_TTL seconds.
+
+    Saves the User lookup Flask-Login would otherwise make on every authenticated
+    request. The worker that creates, edits or deletes a user drops its entry
+    immediately; other workers pick the change up when their entry expires.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config['USER_CACHE_TTL']
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            principal = self._entries.get(user_id)
+            if principal is not None and now - principal.loaded_at < self.ttl:
+                self._entries.move_to_end(user_id)
+                return principal
+        user = db.session.get(User, user_id)
+        with self._lock:
+            if user is None:
+                self._entries.pop(user_id, None)
+                return None
+            principal = self._entries[user_id] = UserPrincipal(user, now)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+principals = PrincipalCache()
@@ -0,0 +1,277 @@
+"""Load test: a simulated auction night against a real gunicorn server.
+
+Run from the project root:
+    python benchmarks/auction_night.py [--workers 2] [--captains 8] [--admins 2] [--spectators 50]
+                                       [--players 200] [--duration 30] [--api] [--baseline FILE] [--save]
+
+One admin drives the auction (next player -> sold/unsold -> next round, restarting
+when everyone is processed), through the admin pages or with --api the JSON control
+API (bids, then one sold/unsold request per player), while the other admins, the captains and anonymous
+spectators poll the pages they'd have open. Every request is timed client-side;
+SQL counts come from the Server-Timing header added by METRICS_ENABLED. Clients
+accept gzip like a browser does, and the report shows the KB each route sends.
+
+Uses a throwaway SQLite file, or BENCH_DATABASE_URL (e.g. a local Postgres) to
+test against a server database. With --baseline FILE the results are compared to
+FILE, or saved to it if it doesn't exist yet (--save overwrites it).
+"""
+import argparse
+import gzip
+import http.cookiejar
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+_tmp = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL', f"sqlite:///{os.path.join(_tmp, 'auction_night.db')}")
+# Cheap password hashes: login cost isn't what this benchmark measures
+os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+PASSWORD = 'bench-pass'
+
+SERVER_ENV = {
+    'METRICS_ENABLED': '1',
+    'EVENTS_SOCKET_DIR': os.path.join(_tmp, 'events'),
+    'LOGIN_ATTEMPTS_PER_IP': '100000', # Every simulated user logs in from 127.0.0.1
+    'AUCTION_DRAW_SEED': '2025',
+}
+CAPTAIN_PAGES = ('/players', '/api/players?sort=runs', '/teams', '/auctions')
+ADMIN_PAGES = ('/auctions', '/dashboard')
+SPECTATOR_PAGES = ('/auctions', '/teams', '/')
+SQL_QUERIES = re.compile(r'sql;desc="(\d+) queries"')
+
+
+def setup_database(players, captains, admins, seed):
+    from app import app, init_db
+    from models import db, Player, Season, Team, User
+    rng = random.Random(seed)
+    init_db()
+    with app.app_context():
+        season = Season.query.filter_by(is_current=True).first() # The league init_db seeds
+        db.session.bulk_insert_mappings(Player, [dict(
+            season_id=season.id, player_name=f'Bench Player {i}', status='Unsold', sold_price=0,
+            cpl_2024_runs=rng.randint(0, 400), cpl_2024_sr=round(rng.uniform(60, 180), 2), overall_wickets=rng.randint(0, 150),
+        ) for i in range(players)])
+        team_ids = [team_id for (team_id,) in db.session.query(Team.id).filter_by(season_id=season.id).order_by(Team.id)]
+        for i in range(admins + captains):
+            role = 'Admin' if i < admins else 'Captain'
+            team_id = team_ids[i - admins] if role == 'Captain' and i - admins < len(team_ids) else None
+            user = User(full_name=f'Bench {role} {i}', username=f'bench{i}', role=role, team_id=team_id, league_id=season.league_id)
+            user.set_password(PASSWORD)
+            db.session.add(user)
+        db.session.commit()
+        db.engine.dispose()
+        return team_ids
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers, port):
+    env = dict(os.environ, **SERVER_ENV, WEB_CONCURRENCY=str(workers))
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app', '-k', 'gthread', '--threads', '8',
+                               '-b', f'127.0.0.1:{port}', '--log-level', 'warning'], cwd=ROOT, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/auctions', timeout=2); return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('server did not start')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None # Report the 302 itself; the auctioneer decides what to request next
+
+
+class Client:
+    """One simulated browser: its own cookies, recording every request into ``samples``."""
+
+    def __init__(self, base, samples):
+        self.base = base
+        self.samples = samples
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+
+    def request(self, path, data=None, json_body=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        headers = {'Accept-Encoding': 'gzip'}
+        if json_body is not None:
+            body = json.dumps(json_body).encode(); headers['Content-Type'] = 'application/json'; data = json_body
+        started = time.perf_counter()
+        try:
+            response = self.opener.open(urllib.request.Request(self.base + path, body, headers), timeout=30)
+        except urllib.error.HTTPError as e:
+            response = e # 3xx/4xx/5xx still carry status, headers and body
+        content = response.read(); size = len(content)
+        if response.headers.get('Content-Encoding') == 'gzip': content = gzip.decompress(content)
+        content = content.decode('utf-8', 'replace')
+        elapsed = time.perf_counter() - started
+        queries = SQL_QUERIES.search(response.headers.get('Server-Timing') or '')
+        route = ('POST ' if data is not None else 'GET ') + re.sub(r'/\d+', '/<id>', path.split('?')[0])
+        self.samples.append((route, elapsed, response.status, int(queries.group(1)) if queries else None, size))
+        return response.status, response.headers.get('Location') or '', content
+
+    def login(self, username):
+        status, _, _ = self.request('/login', {'username': username, 'password': PASSWORD})
+        if status != 302:
+            raise RuntimeError(f'login failed for {username}: HTTP {status}')
+
+
+def auctioneer(client, team_ids, rng, stop):
+    """Drive the auction the way the admin panel does, for as long as the run lasts."""
+    while not stop.is_set():
+        _, _, page = client.request('/auctions')
+        on_block = re.search(r'/sold/(\d+)', page)
+        if on_block:
+            player_id = on_block.group(1)
+            if rng.random() < 0.6:
+                _, location, _ = client.request(f'/sold/{player_id}', {'team_id': rng.choice(team_ids), 'sold_price': rng.randrange(100, 400, 10)})
+            else:
+                _, location, _ = client.request(f'/unsold/{player_id}', {})
+            if location.endswith('/next_player'):
+                client.request('/next_player')
+        elif '/start_next_round' in page:
+            client.request('/start_next_round')
+        elif 'Start New Auction' in page:
+            client.request('/restart_auction', {'password': PASSWORD})
+        else:
+            client.request('/next_player')
+
+
+def api_auctioneer(client, team_ids, rng, stop):
+    """The same auction driven through /api/auction: a few bids, then sold/unsold (which also draws the next player)."""
+    _, _, body = client.request('/api/auction/next', json_body={})
+    while not stop.is_set():
+        state = json.loads(body).get('state') or {}
+        if state.get('live') and state.get('player'):
+            for team_id in rng.sample(team_ids, rng.randint(0, 3)):
+                _, _, reply = client.request('/api/auction/bid', json_body={'team_id': team_id})
+                state = json.loads(reply).get('state') or state
+            _, _, body = client.request('/api/auction/sold' if state.get('bid') else '/api/auction/unsold', json_body={})
+        elif state.get('round_complete'):
+            _, _, body = client.request('/api/auction/next_round', json_body={})
+        elif state.get('complete'):
+            client.request('/restart_auction', {'password': PASSWORD}); _, _, body = client.request('/api/auction/next', json_body={})
+        else:
+            _, _, body = client.request('/api/auction/next', json_body={})
+
+
+def poller(client, pages, rng, stop, think):
+    while not stop.is_set():
+        client.request(rng.choice(pages))
+        stop.wait(rng.uniform(0, 2 * think))
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarise(samples, duration):
+    routes = {}
+    for route, elapsed, status, queries, size in samples:
+        routes.setdefault(route, []).append((elapsed, status, queries, size))
+    report = {'requests': len(samples), 'throughput_rps': len(samples) / duration, 'routes': {}}
+    for route, rows in sorted(routes.items()):
+        latencies = [elapsed * 1000 for elapsed, _, _, _ in rows]
+        queries = [q for _, _, q, _ in rows if q is not None]
+        report['routes'][route] = {
+            'requests': len(rows), 'rps': len(rows) / duration,
+            'p50_ms': percentile(latencies, 0.50), 'p99_ms': percentile(latencies, 0.99),
+            'queries': statistics.mean(queries) if queries else None,
+            'kb': statistics.mean(size for _, _, _, size in rows) / 1024,
+            'errors': sum(1 for _, status, _, _ in rows if status >= 500),
+        }
+    return report
+
+
+def print_report(report, baseline=None):
+    print(f"{'route':34} {'reqs':>6} {'req/s':>7} {'p50 ms':>8} {'p99 ms':>8} {'queries':>8} {'KB':>7} {'5xx':>4}")
+    for route, row in report['routes'].items():
+        queries = f"{row['queries']:.1f}" if row['queries'] is not None else '-'
+        line = f"{route:34} {row['requests']:>6} {row['rps']:>7.1f} {row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f} {queries:>8} {row['kb']:>7.1f} {row['errors']:>4}"
+        before = (baseline or {}).get('routes', {}).get(route)
+        if before:
+            line += f"   p50 {_change(before['p50_ms'], row['p50_ms'])}, p99 {_change(before['p99_ms'], row['p99_ms'])}"
+            if before['queries'] is not None and row['queries'] is not None and round(before['queries'], 1) != round(row['queries'], 1):
+                line += f", queries {before['queries']:.1f} -> {row['queries']:.1f}"
+            if before.get('kb'): line += f", KB {_change(before['kb'], row['kb'])}"
+        print(line)
+    total = f"total: {report['requests']} requests, {report['throughput_rps']:.1f} req/s"
+    if baseline:
+        total += f" (baseline {baseline['throughput_rps']:.1f} req/s, {_change(baseline['throughput_rps'], report['throughput_rps'])})"
+    print(total)
+
+
+def _change(before, after):
+    return f'{(after - before) / before * 100:+.0f}%' if before else 'n/a'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--captains', type=int, default=8)
+    parser.add_argument('--admins', type=int, default=2, help='The first one drives the auction')
+    parser.add_argument('--spectators', type=int, default=50)
+    parser.add_argument('--players', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of load after everyone has logged in')
+    parser.add_argument('--think', type=float, default=0.5, help='Mean pause between page loads for pollers, seconds')
+    parser.add_argument('--seed', type=int, default=2025)
+    parser.add_argument('--api', action='store_true', help='Drive the auction through the JSON control API')
+    parser.add_argument('--baseline', help='JSON file to compare against (created if missing)')
+    parser.add_argument('--save', action='store_true', help='Overwrite --baseline with this run')
+    args = parser.parse_args()
+
+    team_ids = setup_database(args.players, args.captains, max(args.admins, 1), args.seed)
+    port = free_port()
+    server = start_server(args.workers, port)
+    try:
+        base = f'http://127.0.0.1:{port}'
+        stop = threading.Event()
+        samples = [] # list.append is atomic, so every thread records into the same list
+        users = []
+        for i in range(max(args.admins, 1) + args.captains):
+            client = Client(base, samples); client.login(f'bench{i}'); users.append(client)
+        samples.clear() # Logins aren't part of the measured load
+        rng = random.Random(args.seed)
+        threads = [threading.Thread(target=api_auctioneer if args.api else auctioneer, args=(users[0], team_ids, random.Random(rng.random()), stop))]
+        threads += [threading.Thread(target=poller, args=(client, ADMIN_PAGES, random.Random(rng.random()), stop, args.think)) for client in users[1:max(args.admins, 1)]]
+        threads += [threading.Thread(target=poller, args=(client, CAPTAIN_PAGES, random.Random(rng.random()), stop, args.think)) for client in users[max(args.admins, 1):]]
+        threads += [threading.Thread(target=poller, args=(Client(base, samples), SPECTATOR_PAGES, random.Random(rng.random()), stop, args.think)) for _ in range(args.spectators)]
+        started = time.perf_counter()
+        for thread in threads: thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads: thread.join()
+        report = summarise(samples, time.perf_counter() - started)
+    finally:
+        server.terminate(); server.wait()
+
+    report['config'] = {key: value for key, value in vars(args).items() if key not in ('baseline', 'save')}
+    report['database'] = os.environ['DATABASE_URL'].split(':', 1)[0]
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f: baseline = json.load(f)
+        if baseline.get('config') != report['config'] or baseline.get('database') != report['database']:
+            print(f"note: baseline was recorded with {baseline.get('config')} on {baseline.get('database')}")
+    print_report(report, baseline)
+    if args.baseline and (args.save or baseline is None):
+        with open(args.baseline, 'w') as f: json.dump(report, f, indent=2)
+        print(f'baseline saved to {args.baseline}')
@@ -0,0 +1,59 @@
+"""Auction reset time versus roster size: old per-row ORM loop vs set-based UPDATEs.
+
+Run from the project root:  python benchmarks/bench_reset.py [roster sizes...]
+Uses a throwaway SQLite file (or BENCH_DATABASE_URL, e.g. a local Postgres).
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_file = os.path.join(tempfile.mkdtemp(), 'bench_reset.db')
+os.environ['DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL', f'sqlite:///{_db_file}')
+
+from app import app, reset_auction_data
+from models import db, League, Player, Season, Team
+from tenancy import tenancy
+
+TEAMS = 8
+REPEATS = 3
+
+
+def populate(roster_size):
+    db.drop_all(); db.create_all()
+    season = Season(league=League(slug='bench', name='Bench League'), name='bench', is_current=True)
+    db.session.add(season); db.session.flush()
+    db.session.bulk_insert_mappings(Team, [dict(season_id=season.id, team_name=f'Team {i}', captain_name=f'Captain {i}', purse=5000, purse_spent=5000, players_taken_count=15, slots_remaining=0) for i in range(TEAMS)])
+    db.session.bulk_insert_mappings(Player, [dict(season_id=season.id, player_name=f'Player {i}', status='Sold', sold_price=100, team_id=i % TEAMS + 1) for i in range(roster_size)])
+    db.session.commit()
+
+
+def legacy_reset():
+    # What restart_auction() used to do
+    for player in Player.query.all(): player.status = 'Unsold'; player.sold_price = 0; player.team_id = None
+    for team in Team.query.all(): team.purse = 10000; team.purse_spent = 0; team.players_taken_count = 0; team.slots_remaining = 15
+    db.session.commit()
+
+
+def bulk_reset():
+    reset_auction_data(tenancy.current()); db.session.commit()
+
+
+def timed(roster_size, reset):
+    best = None
+    for _ in range(REPEATS):
+        populate(roster_size); db.session.expunge_all()
+        started = time.perf_counter(); reset(); elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    assert Player.query.filter_by(status='Unsold').count() == roster_size
+    return best
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or [120, 1000, 10000, 50000]
+    with app.app_context():
+        print(f"{'players':>8} {'per-row (ms)':>14} {'set-based (ms)':>15} {'speed-up':>9}")
+        for size in sizes:
+            legacy = timed(size, legacy_reset); bulk = timed(size, bulk_reset)
+            print(f'{size:>8} {legacy * 1000:>14.1f} {bulk * 1000:>15.1f} {legacy / bulk:>8.1f}x')
@@ -0,0 +1,41 @@
+"""Cold-start cost of the web process: time to `import app` and resident memory afterwards.
+
+Run from the project root:  python benchmarks/bench_startup.py [runs]
+Each run is a fresh interpreter so module caches don't hide import cost.
+Add -X importtime to the child command to see which modules dominate.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+with open('/proc/self/statm') as statm:
+    rss_pages = int(statm.read().split()[1])
+print(json.dumps({
+    'import_ms': elapsed * 1000,
+    'rss_mb': rss_pages * resource.getpagesize() / 2 ** 20,
+    'modules': len(sys.modules),
+    'pandas_loaded': 'pandas' in sys.modules,
+    'openpyxl_loaded': 'openpyxl' in sys.modules,
+}))
+'''
+
+
+def run_once():
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    runs = [run_once() for _ in range(int(sys.argv[1]) if len(sys.argv) > 1 else 5)]
+    print(f"import app: median {statistics.median(r['import_ms'] for r in runs):.1f} ms, "
+          f"RSS median {statistics.median(r['rss_mb'] for r in runs):.1f} MiB, "
+          f"{runs[0]['modules']} modules, pandas loaded={runs[0]['pandas_loaded']}, openpyxl loaded={runs[0]['openpyxl_loaded']}")
@@ -0,0 +1,77 @@
+"""Fire parallel sales at one database and check nothing is oversold or sold twice.
+
+Run from the project root:  python benchmarks/stress_sales.py [threads]
+Uses a throwaway SQLite file (or BENCH_DATABASE_URL, e.g. a local Postgres).
+"""
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_file = os.path.join(tempfile.mkdtemp(), 'stress_sales.db')
+os.environ['DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL', f'sqlite:///{_db_file}')
+
+from sqlalchemy.exc import OperationalError
+from app import app
+from models import db, League, Player, Season, Team
+from sales import apply_sale, SaleRejected
+
+SLOTS = 5
+PURSE = 1000
+PRICE = 150 # Purse allows 6 sales at this price but only 5 slots, so slots run out first
+
+
+def setup(players):
+    db.drop_all(); db.create_all()
+    season = Season(league=League(slug='bench', name='Bench League'), name='bench', is_current=True)
+    db.session.add(season); db.session.flush()
+    db.session.bulk_insert_mappings(Team, [dict(season_id=season.id, team_name=f'Team {i}', captain_name='-', purse=PURSE, purse_spent=0, players_taken_count=0, slots_remaining=SLOTS) for i in range(2)])
+    db.session.bulk_insert_mappings(Player, [dict(season_id=season.id, player_name=f'Player {i}', status='Unsold', sold_price=0) for i in range(players)])
+    db.session.commit()
+
+
+def run_parallel(jobs):
+    """Run ``(player_id, team_id)`` sales on separate threads, all released at once."""
+    results = {'sold': 0, 'rejected': 0, 'errors': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(jobs))
+
+    def sell(player_id, team_id):
+        with app.app_context():
+            barrier.wait()
+            try:
+                apply_sale(player_id, team_id, PRICE); db.session.commit(); outcome = 'sold'
+            except SaleRejected:
+                db.session.rollback(); outcome = 'rejected'
+            except OperationalError:
+                db.session.rollback(); outcome = 'errors' # e.g. SQLite lock timeout: retried by the admin, never half-applied
+        with lock:
+            results[outcome] += 1
+
+    threads = [threading.Thread(target=sell, args=job) for job in jobs]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    return results
+
+
+if __name__ == '__main__':
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    with app.app_context():
+        # 1. Many different players sold to the same team at once: the team must stop at its slot limit
+        setup(workers)
+        results = run_parallel([(player_id, 1) for player_id in range(1, workers + 1)])
+        team = db.session.get(Team, 1)
+        sold = Player.query.filter_by(status='Sold').count()
+        print(f'same team:   {results}, team slots_remaining={team.slots_remaining} purse={team.purse}, players sold={sold}')
+        assert team.slots_remaining >= 0 and team.purse >= 0
+        assert sold == results['sold'] == team.players_taken_count <= SLOTS
+        assert team.purse == PURSE - PRICE * sold
+
+        # 2. The same player sold to two teams at once: exactly one sale may win
+        setup(1)
+        results = run_parallel([(1, team_id) for team_id in (1, 2) for _ in range(workers // 2)])
+        taken = sum(team.players_taken_count for team in Team.query.all())
+        print(f'same player: {results}, total players_taken_count={taken}')
+        assert results['sold'] == 1 and taken == 1
+    print('OK')
@@ -0,0 +1,119 @@
+import re
+import zlib
+from flask import g, request
+
+try:
+    import brotli # Optional: 'br' is only offered when it's installed
+except ImportError:
+    brotli = None
+
+# Worth compressing; images, spreadsheets and the like are already compressed
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+                      'application/javascript', 'application/json', 'image/svg+xml')
+# Whitespace is significant (or not worth touching) inside these elements
+PRESERVED_ELEMENT = r'<(?P<tag>pre|textarea|script|style)\b.*?</(?P=tag)\s*>'
+HTML_WHITESPACE = re.compile(rf'({PRESERVED_ELEMENT})|\s*\n\s*', re.S | re.I)
+
+
+def minify_html(html):
+    """Collapse every whitespace run that contains a line break (indentation, blank lines) to a single newline.
+
+    HTML renders any whitespace run between words or inline elements as one space, so
+    the page looks the same; <pre>, <textarea>, <script> and <style> are left as written.
+    """
+    return HTML_WHITESPACE.sub(lambda m: m.group(1) or '\n', html)
+
+
+class ResponseCompressor:
+    """gzip/Brotli response compression plus whitespace minification of rendered HTML.
+
+    Text responses of at least COMPRESSION_MIN_SIZE bytes are encoded with the best
+    encoding the client accepts ('br' when Brotli is installed, else 'gzip'), and
+    every compressible response varies on Accept-Encoding. Streamed responses (the
+    CSV export, static files) are encoded chunk by chunk as they are sent. Pages from
+    the page cache keep their minified/compressed bodies with the cache entry, so a
+    cached page is only encoded once per version.
+    """
+
+    def init_app(self, app):
+        self.enabled = app.config['COMPRESSION_ENABLED']
+        self.minify = app.config['HTML_MINIFY']
+        self.min_size = app.config['COMPRESSION_MIN_SIZE']
+        self.gzip_level = app.config['COMPRESSION_GZIP_LEVEL']
+        self.brotli_quality = app.config['COMPRESSION_BROTLI_QUALITY']
+        if self.enabled or self.minify:
+            app.after_request(self._process)
+
+    def negotiate(self):
+        """The encoding to use for this request, or None."""
+        accept = request.accept_encodings
+        if brotli is not None and accept['br']: return 'br'
+        if accept['gzip']: return 'gzip'
+        return None
+
+    def _encoder(self, encoding):
+        if encoding == 'br': return brotli.Compressor(quality=self.brotli_quality)
+        return zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31) # wbits 31: gzip header and trailer
+
+    def compress(self, data, encoding):
+        if encoding == 'br': return brotli.compress(data, quality=self.brotli_quality)
+        encoder = self._encoder(encoding)
+        return encoder.compress(data) + encoder.flush()
+
+    def _process(self, response):
+        if (response.status_code < 200 or response.status_code in (204, 206, 304) or request.method == 'HEAD'
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate() if self.enabled else None
+        if response.is_streamed or response.direct_passthrough:
+            length = response.content_length
+            if encoding and (length is None or length >= self.min_size):
+                self._encode_stream(response, encoding)
+            return response
+        entry = getattr(response, 'page_cache_entry', None) # Set by page_cache.cached_page
+        variant = entry.encoded.get(encoding) if entry is not None else None
+        if variant is None:
+            body = response.get_data()
+            rendered = len(body)
+            if self.minify and response.mimetype == 'text/html':
+                body = minify_html(body.decode('utf-8')).encode('utf-8')
+            used = encoding if encoding and len(body) >= self.min_size else None
+            variant = (self.compress(body, used) if used else body, used, rendered)
+            if entry is not None: entry.encoded[encoding] = variant
+        body, used, rendered = variant
+        response.set_data(body)
+        if used: self._mark_encoded(response, used)
+        g.response_bytes = (rendered, len(body)) # Picked up by metrics.py
+        return response
+
+    def _mark_encoded(self, response, encoding):
+        response.headers['Content-Encoding'] = encoding
+        # Same resource, different bytes: a weak ETag still revalidates but doesn't claim byte equality
+        etag, weak = response.get_etag()
+        if etag and not weak: response.set_etag(etag, weak=True)
+
+    def _encode_stream(self, response, encoding):
+        chunks = response.response
+        progressive = not response.direct_passthrough # Generators (the CSV export) send each chunk as soon as it's ready
+        encoder = self._encoder(encoding)
+
+        def generate():
+            try:
+                for chunk in chunks:
+                    if isinstance(chunk, str): chunk = chunk.encode('utf-8')
+                    if not chunk: continue
+                    data = encoder.process(chunk) if encoding == 'br' else encoder.compress(chunk)
+                    if progressive: data += encoder.flush() if encoding == 'br' else encoder.flush(zlib.Z_SYNC_FLUSH)
+                    if data: yield data
+                yield encoder.finish() if encoding == 'br' else encoder.flush()
+            finally:
+                if hasattr(chunks, 'close'): chunks.close()
+
+        response.response = generate()
+        response.direct_passthrough = False
+        response.headers.pop('Content-Length', None)
+        self._mark_encoded(response, encoding)
+
+
+compressor = ResponseCompressor()
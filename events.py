@@ -0,0 +1,127 @@
+import glob
+import json
+import os
+import queue
+import socket
+import threading
+
+# Comment lines sent while idle so proxies and browsers keep the stream open
+HEARTBEAT_SECONDS = 15
+# Events buffered per listener before it is told to resync (reload) instead
+SUBSCRIBER_QUEUE_SIZE = 64
+MAX_DATAGRAM = 65536
+
+
+def format_sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+class EventBroker:
+    """Fans auction events out to every Server-Sent Events listener.
+
+    Within a worker an event is formatted once and the same string is handed to
+    each listener's queue. With several gunicorn workers, set EVENTS_SOCKET_DIR to
+    a directory all workers can write to: each worker that has listeners binds a
+    Unix datagram socket there and ``publish`` sends one datagram per worker.
+    Listeners subscribe to a channel (one per league season) and only receive
+    that channel's events.
+    """
+
+    def __init__(self):
+        self._subscribers = {} # channel -> set of listener queues
+        self._lock = threading.Lock()
+        self._socket_dir = None
+        self._socket_path = None
+        self._owner_pid = None
+
+    def init_app(self, app):
+        self._socket_dir = app.config.get('EVENTS_SOCKET_DIR')
+        if self._socket_dir:
+            os.makedirs(self._socket_dir, exist_ok=True)
+        app.extensions['event_broker'] = self
+
+    # --- Listener side ---
+    def subscribe(self, channel=None):
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        q.channel = channel
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(q)
+        if self._socket_dir:
+            self._ensure_listener()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            listeners = self._subscribers.get(q.channel)
+            if listeners is not None:
+                listeners.discard(q)
+                if not listeners: del self._subscribers[q.channel]
+
+    def stream(self, q):
+        """Generator of SSE chunks for one listener; unsubscribes when the client goes away."""
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    yield q.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+        finally:
+            self.unsubscribe(q)
+
+    # --- Publisher side ---
+    def publish(self, event, data=None, channel=None):
+        message = {'event': event, 'data': data or {}, 'channel': channel}
+        if not self._socket_dir:
+            self._deliver(message)
+            return
+        payload = json.dumps(message).encode('utf-8')
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            for path in glob.glob(os.path.join(self._socket_dir, 'worker-*.sock')):
+                try:
+                    sender.sendto(payload, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Worker exited without cleaning up its socket
+                    try: os.unlink(path)
+                    except OSError: pass
+                except OSError:
+                    pass # Full receive buffer on a busy worker: drop rather than block the admin request
+        finally:
+            sender.close()
+
+    def _deliver(self, message):
+        chunk = format_sse(message['event'], message['data'])
+        with self._lock:
+            subscribers = list(self._subscribers.get(message.get('channel'), ()))
+        for q in subscribers:
+            try:
+                q.put_nowait(chunk)
+            except queue.Full:
+                # Listener fell behind; make it reload the page rather than show a stale DOM
+                with q.mutex: q.queue.clear()
+                q.put_nowait(format_sse('resync', {}))
+
+    def _ensure_listener(self):
+        # Bind lazily and per process so pre-forked gunicorn workers each get their own socket
+        with self._lock:
+            if self._owner_pid == os.getpid():
+                return
+            self._owner_pid = os.getpid()
+            self._socket_path = os.path.join(self._socket_dir, f'worker-{os.getpid()}.sock')
+        try: os.unlink(self._socket_path)
+        except OSError: pass
+        receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        receiver.bind(self._socket_path)
+        threading.Thread(target=self._listen, args=(receiver,), name='event-broker', daemon=True).start()
+
+    def _listen(self, receiver):
+        while True:
+            try:
+                payload = receiver.recv(MAX_DATAGRAM)
+                self._deliver(json.loads(payload))
+            except (OSError, ValueError):
+                continue
+
+
+broker = EventBroker()
@@ -0,0 +1,107 @@
+import csv
+import io
+import re
+from models import db, Player, Team
+from page_cache import PageCache
+
+# (Header, Player attribute) for every exported player row; {stats} is the season's Season.stats_label
+PLAYER_COLUMNS = [
+    ('Player Name', 'player_name'),
+    ('Sold Price', 'sold_price'),
+    ('Overall Matches', 'overall_matches'),
+    ('Overall Runs', 'overall_runs'),
+    ('Overall Wickets', 'overall_wickets'),
+    ('Overall Bat Avg', 'overall_bat_avg'),
+    ('Overall Bowl Avg', 'overall_bowl_avg'),
+    ('{stats} Team', 'cpl_2024_team'),
+    ('{stats} Innings', 'cpl_2024_innings'),
+    ('{stats} Runs', 'cpl_2024_runs'),
+    ('{stats} Average', 'cpl_2024_average'),
+    ('{stats} SR', 'cpl_2024_sr'),
+    ('{stats} HS', 'cpl_2024_hs'),
+]
+SUMMARY_COLUMNS = [
+    ('Team Name', 'team_name'),
+    ('Captain', 'captain_name'),
+    ('Players', 'players_taken_count'),
+    ('Purse Spent', 'purse_spent'),
+    ('Purse Remaining', 'purse'),
+    ('Slots Left', 'slots_remaining'),
+]
+CSV_BATCH_ROWS = 200
+
+# Generated files keyed by (kind, season, team, auction data_version); a sale bumps it so stale files age out
+cache = PageCache(max_entries=32)
+
+
+def player_headers(stats_label):
+    return [header.format(stats=stats_label) for header, _ in PLAYER_COLUMNS]
+
+
+def player_row(player):
+    return [getattr(player, attribute) for _, attribute in PLAYER_COLUMNS]
+
+
+def sheet_title(name, used):
+    # Excel sheet names: max 31 chars, no []:*?/\ and unique within the workbook
+    title = re.sub(r'[\[\]:*?/\\]', '-', name)[:31] or 'Sheet'
+    base, n = title, 2
+    while title.lower() in used:
+        suffix = f' ({n})'; title = base[:31 - len(suffix)] + suffix; n += 1
+    used.add(title.lower())
+    return title
+
+
+def build_workbook(teams, stats_label, summary=True):
+    """Return .xlsx bytes with an optional summary sheet and one sheet per team."""
+    from openpyxl import Workbook # Deferred: only export requests pay for openpyxl
+    workbook = Workbook(write_only=True)
+    used = set()
+    if summary:
+        sheet = workbook.create_sheet(sheet_title('Summary', used))
+        sheet.append([header for header, _ in SUMMARY_COLUMNS])
+        for team in teams:
+            sheet.append([getattr(team, attribute) for _, attribute in SUMMARY_COLUMNS])
+    players_by_team = {team.id: [] for team in teams}
+    # One query for every sold player instead of a lazy team.players load per team
+    for player in Player.query.filter(Player.team_id.in_(list(players_by_team))).order_by(Player.team_id, Player.sold_price.desc()):
+        players_by_team[player.team_id].append(player)
+    for team in teams:
+        sheet = workbook.create_sheet(sheet_title(team.team_name, used))
+        sheet.append(player_headers(stats_label))
+        for player in players_by_team[team.id]:
+            sheet.append(player_row(player))
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+def cached_workbook(key, teams, stats_label, summary=True):
+    data = cache.get(key)
+    if data is None:
+        data = build_workbook(teams, stats_label, summary)
+        cache.set(key, data)
+    return data
+
+
+def stream_csv(key, season):
+    """Yield a season's full-auction CSV in batches of rows, caching the complete file once it has streamed."""
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    buffer = io.StringIO(); writer = csv.writer(buffer); chunks = []
+
+    def flush():
+        chunk = buffer.getvalue().encode('utf-8'); buffer.seek(0); buffer.truncate(0); chunks.append(chunk)
+        return chunk
+
+    writer.writerow(['Team Name', 'Status'] + player_headers(season.stats_label))
+    query = (db.session.query(Player, Team.team_name).outerjoin(Team, Player.team_id == Team.id)
+             .filter(Player.season_id == season.id).order_by(Team.team_name, Player.player_name).yield_per(CSV_BATCH_ROWS))
+    for count, (player, team_name) in enumerate(query, start=1):
+        writer.writerow([team_name or '', player.status] + player_row(player))
+        if count % CSV_BATCH_ROWS == 0:
+            yield flush()
+    yield flush()
+    cache.set(key, b''.join(chunks))
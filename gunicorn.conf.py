@@ -0,0 +1,52 @@
+# Gunicorn settings, picked up automatically by `gunicorn app:app` from the project root
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+# Every spectator on /auctions or /teams holds a /auctions/events stream open, and a gthread
+# worker spends one thread per open stream: a worker serves up to `threads` viewers plus page
+# loads, so size workers * threads above the expected crowd. Sync workers would block on the
+# first stream. For hundreds of spectators use gevent instead (pip install gevent, then
+# GUNICORN_WORKER_CLASS=gevent), where a stream costs a greenlet rather than a thread.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', '64'))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '1000')) # Open connections per worker, streams included
+# Live events must reach listeners in every worker, not just the one that handled the admin's
+# POST, so give the workers a shared socket directory unless one is configured (read by app.py)
+_events_dir_created = None
+if workers > 1 and not os.environ.get('EVENTS_SOCKET_DIR'):
+    _events_dir_created = os.environ['EVENTS_SOCKET_DIR'] = tempfile.mkdtemp(prefix='cpl-events-')
+# Import the app once in the master so workers share its memory copy-on-write
+preload_app = True
+
+
+def on_starting(server):
+    # Create/seed the database once per deployment instead of in every worker's first request
+    from app import app, init_db
+    from assets import assets
+    from models import db
+    if server.cfg.workers > 1 and not app.config['EVENTS_SOCKET_DIR']:
+        # e.g. `-w 4` on the command line with WEB_CONCURRENCY=1: events would stay in one worker
+        raise RuntimeError('Running several workers needs EVENTS_SOCKET_DIR for live event fan-out.')
+    init_db()
+    assets.build_variants() # Resized/WebP player images, only for new or changed photos
+    with app.app_context():
+        db.engine.dispose() # Forked workers must open their own connections
+
+
+def post_fork(server, worker):
+    worker.boot_started = time.perf_counter()
+
+
+def post_worker_init(worker):
+    # Track per-worker startup cost; ru_maxrss is in KiB on Linux
+    boot_ms = (time.perf_counter() - worker.boot_started) * 1000
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    worker.log.info('worker %s ready: boot %.1f ms, max RSS %.1f MiB', worker.pid, boot_ms, rss_mb)
+
+
+def on_exit(server):
+    if _events_dir_created: shutil.rmtree(_events_dir_created, ignore_errors=True)
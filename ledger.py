@@ -0,0 +1,117 @@
+import json
+from flask import current_app
+from sqlalchemy import update
+from models import db, AuctionEvent, LedgerSnapshot, Player, Team
+from tenancy import tenancy
+
+
+class NothingToUndo(Exception):
+    """Raised when there is no sale since the last reset that can be reversed."""
+
+
+def record(kind, actor=None, detail=None, **fields):
+    """Append an event inside the caller's transaction (after the Player/Team changes it describes).
+
+    Events belong to the current league season. Every LEDGER_SNAPSHOT_INTERVAL
+    events the current projection is snapshotted too.
+    """
+    event = AuctionEvent(season_id=tenancy.current().id, kind=kind, actor=actor, detail=json.dumps(detail) if detail else None, **fields)
+    db.session.add(event)
+    db.session.flush()
+    if kind == 'reset' or event.id % current_app.config['LEDGER_SNAPSHOT_INTERVAL'] == 0:
+        take_snapshot(event.id, event.season_id)
+    return event
+
+
+def take_snapshot(event_id, season_id):
+    players = {player_id: [status, sold_price, team_id] for player_id, status, sold_price, team_id
+               in db.session.query(Player.id, Player.status, Player.sold_price, Player.team_id).filter(Player.season_id == season_id)}
+    teams = {team_id: [purse, spent, taken, slots] for team_id, purse, spent, taken, slots
+             in db.session.query(Team.id, Team.purse, Team.purse_spent, Team.players_taken_count, Team.slots_remaining).filter(Team.season_id == season_id)}
+    db.session.add(LedgerSnapshot(season_id=season_id, event_id=event_id, players=json.dumps(players), teams=json.dumps(teams)))
+
+
+# --- Undo ---
+def last_sale():
+    """The current season's most recent sale since its last reset that has not been undone, or None."""
+    season_id = tenancy.current().id
+    last_reset = (db.session.query(db.func.max(AuctionEvent.id))
+                  .filter(AuctionEvent.season_id == season_id, AuctionEvent.kind == 'reset').scalar() or 0)
+    sale = AuctionEvent.__table__.alias('sale')
+    undone = db.session.query(AuctionEvent.id).filter(AuctionEvent.kind == 'undo', AuctionEvent.ref_event_id == sale.c.id)
+    row = (db.session.query(sale.c.id).filter(sale.c.season_id == season_id, sale.c.kind == 'sold', sale.c.id > last_reset, ~undone.exists())
+           .order_by(sale.c.id.desc()).first())
+    return db.session.get(AuctionEvent, row[0]) if row else None
+
+
+def undo_last_sale(actor=None):
+    """Reverse the latest sale with two guarded UPDATEs and append an 'undo' event; returns the sale event."""
+    sale = last_sale()
+    if sale is None:
+        raise NothingToUndo()
+    released = db.session.execute(
+        update(Player)
+        .where(Player.id == sale.player_id, Player.status == 'Sold', Player.team_id == sale.team_id)
+        .values(status='Unsold', sold_price=0, team_id=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if released != 1:
+        raise NothingToUndo()
+    db.session.execute(
+        update(Team).where(Team.id == sale.team_id)
+        .values(purse=Team.purse + sale.amount, purse_spent=Team.purse_spent - sale.amount,
+                players_taken_count=Team.players_taken_count - 1, slots_remaining=Team.slots_remaining + 1)
+        .execution_options(synchronize_session=False)
+    )
+    record('undo', actor=actor, player_id=sale.player_id, team_id=sale.team_id, amount=sale.amount, ref_event_id=sale.id)
+    return sale
+
+
+# --- Replay ---
+def _apply(players, teams, default_team, event):
+    if event.kind == 'sold':
+        players[event.player_id] = ['Sold', event.amount, event.team_id]
+        team = teams.setdefault(event.team_id, list(default_team))
+        team[0] -= event.amount; team[1] += event.amount; team[2] += 1; team[3] -= 1
+    elif event.kind == 'undo':
+        players[event.player_id] = ['Unsold', 0, None]
+        team = teams.setdefault(event.team_id, list(default_team))
+        team[0] += event.amount; team[1] -= event.amount; team[2] -= 1; team[3] += 1
+    elif event.kind == 'unsold':
+        players[event.player_id] = [f'Round {event.round} Unsold', 0, None]
+    elif event.kind == 'round_start':
+        previous = f'Round {event.round - 1} Unsold'
+        for state in players.values():
+            if state[0] == previous: state[0] = 'Unsold'
+    elif event.kind == 'reset':
+        detail = json.loads(event.detail)
+        default_team[:] = [detail['purse'], 0, 0, detail['slots']]
+        for player_id in players: players[player_id] = ['Unsold', 0, None]
+        for team_id in teams: teams[team_id] = list(default_team)
+    # 'pause'/'resume' don't touch results
+
+
+def rebuild():
+    """Recompute the current season's Player/Team auction columns from its latest snapshot plus the events after it.
+
+    Returns the number of events replayed. The caller commits.
+    """
+    season = tenancy.current()
+    default_team = [season.team_purse, 0, 0, season.team_slots]
+    players = {player_id: ['Unsold', 0, None] for (player_id,) in db.session.query(Player.id).filter(Player.season_id == season.id)}
+    teams = {team_id: list(default_team) for (team_id,) in db.session.query(Team.id).filter(Team.season_id == season.id)}
+    snapshot = LedgerSnapshot.query.filter_by(season_id=season.id).order_by(LedgerSnapshot.event_id.desc()).first()
+    after = 0
+    if snapshot is not None:
+        after = snapshot.event_id
+        players.update({int(player_id): state for player_id, state in json.loads(snapshot.players).items() if int(player_id) in players})
+        teams.update({int(team_id): state for team_id, state in json.loads(snapshot.teams).items() if int(team_id) in teams})
+    replayed = 0
+    events = AuctionEvent.query.filter(AuctionEvent.season_id == season.id, AuctionEvent.id > after)
+    for event in events.order_by(AuctionEvent.id).yield_per(500):
+        _apply(players, teams, default_team, event); replayed += 1
+    db.session.bulk_update_mappings(Player, [dict(id=player_id, status=status, sold_price=price, team_id=team_id)
+                                             for player_id, (status, price, team_id) in players.items()])
+    db.session.bulk_update_mappings(Team, [dict(id=team_id, purse=purse, purse_spent=spent, players_taken_count=taken, slots_remaining=slots)
+                                           for team_id, (purse, spent, taken, slots) in teams.items() if team_id is not None])
+    return replayed
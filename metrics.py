@@ -0,0 +1,184 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_app_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Statement text truncated to this many characters in N+1 reports
+STATEMENT_PREVIEW = 160
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1) # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (None above the last bucket)."""
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + (None,), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+
+class RouteStats:
+    __slots__ = ('latency', 'queries', 'query_seconds', 'render_seconds', 'n_plus_one', 'last_n_plus_one',
+                 'sized', 'bytes_rendered', 'bytes_sent')
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.render_seconds = 0.0
+        self.n_plus_one = 0
+        self.last_n_plus_one = None
+        self.sized = 0 # Responses with known sizes (streamed ones aren't measured)
+        self.bytes_rendered = 0 # Body as the view produced it
+        self.bytes_sent = 0 # After HTML minification and compression (see compression.py)
+
+
+class RequestMetrics:
+    """Opt-in (METRICS_ENABLED) per-route latency, SQL and template timings.
+
+    SQL statements are counted with engine events and templates timed with Flask's
+    render signals, both attributed to the endpoint handling the request and echoed
+    in a Server-Timing response header. A request that runs the same statement
+    METRICS_N_PLUS_ONE_THRESHOLD or more times is flagged as a likely N+1. Numbers
+    are kept per worker process. Response sizes before and after minification and
+    compression show the bytes saved per route.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.routes = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def init_app(self, app, db):
+        self.enabled = app.config['METRICS_ENABLED']
+        self.n_plus_one_threshold = app.config['METRICS_N_PLUS_ONE_THRESHOLD']
+        if not self.enabled:
+            return
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._query_started)
+            event.listen(db.engine, 'after_cursor_execute', self._query_finished)
+
+    # --- Collection ---
+    def _start(self):
+        g.metrics = {'started': time.perf_counter(), 'queries': 0, 'query_seconds': 0.0,
+                     'render_seconds': 0.0, 'statements': {}}
+
+    def _query_started(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def _query_finished(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_started'].pop()
+        current = g.get('metrics') if has_app_context() else None # Queries outside a request (CLI, startup) aren't attributed
+        if current is not None:
+            current['queries'] += 1
+            current['query_seconds'] += elapsed
+            current['statements'][statement] = current['statements'].get(statement, 0) + 1
+
+    def _render_started(self, sender, template, context, **extra):
+        current = g.get('metrics')
+        if current is not None:
+            current.setdefault('render_stack', []).append(time.perf_counter())
+
+    def _render_finished(self, sender, template, context, **extra):
+        current = g.get('metrics')
+        if current is not None and current.get('render_stack'):
+            current['render_seconds'] += time.perf_counter() - current['render_stack'].pop()
+
+    def _finish(self, response):
+        current = g.pop('metrics', None)
+        if current is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        elapsed = time.perf_counter() - current['started']
+        # Same numbers per response, for browser devtools and the load-test harness
+        response.headers['Server-Timing'] = (f'sql;desc="{current["queries"]} queries";dur={current["query_seconds"] * 1000:.2f}, '
+                                             f'render;dur={current["render_seconds"] * 1000:.2f}, app;dur={elapsed * 1000:.2f}')
+        repeated = max(current['statements'].items(), key=lambda item: item[1], default=(None, 0))
+        sizes = g.pop('response_bytes', None)
+        with self._lock:
+            stats = self.routes.get(endpoint)
+            if stats is None:
+                stats = self.routes[endpoint] = RouteStats()
+            stats.latency.observe(elapsed)
+            stats.queries += current['queries']
+            stats.query_seconds += current['query_seconds']
+            stats.render_seconds += current['render_seconds']
+            if sizes is not None:
+                stats.sized += 1; stats.bytes_rendered += sizes[0]; stats.bytes_sent += sizes[1]
+            if repeated[1] >= self.n_plus_one_threshold:
+                stats.n_plus_one += 1
+                stats.last_n_plus_one = (repeated[1], ' '.join(repeated[0].split())[:STATEMENT_PREVIEW])
+        if repeated[1] >= self.n_plus_one_threshold:
+            logger.warning('Possible N+1 in %s: statement ran %d times: %s', endpoint, repeated[1], ' '.join(repeated[0].split())[:STATEMENT_PREVIEW])
+        return response
+
+    # --- Reporting ---
+    def summary(self):
+        """Per-route rows for the dashboard, slowest (p95 bucket bound, None past the last) first."""
+        with self._lock:
+            rows = [{'endpoint': endpoint, 'requests': s.latency.count,
+                     'avg_ms': s.latency.sum / s.latency.count * 1000, 'p95_ms': s.latency.quantile(0.95) * 1000 if s.latency.quantile(0.95) else None,
+                     'queries_per_request': s.queries / s.latency.count, 'sql_ms': s.query_seconds / s.latency.count * 1000,
+                     'render_ms': s.render_seconds / s.latency.count * 1000,
+                     'n_plus_one': s.n_plus_one, 'last_n_plus_one': s.last_n_plus_one,
+                     'kb_sent': s.bytes_sent / s.sized / 1024 if s.sized else None,
+                     'saved_pct': (1 - s.bytes_sent / s.bytes_rendered) * 100 if s.bytes_rendered else None}
+                    for endpoint, s in self.routes.items() if s.latency.count]
+        return sorted(rows, key=lambda row: (row['p95_ms'] or float('inf'), row['avg_ms']), reverse=True)
+
+    def prometheus(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = [
+            '# HELP cpl_request_duration_seconds Time to build each response, by endpoint.',
+            '# TYPE cpl_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            routes = sorted(self.routes.items())
+            for endpoint, stats in routes:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), stats.latency.counts):
+                    cumulative += count
+                    lines.append(f'cpl_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+                lines.append(f'cpl_request_duration_seconds_sum{{endpoint="{endpoint}"}} {stats.latency.sum:.6f}')
+                lines.append(f'cpl_request_duration_seconds_count{{endpoint="{endpoint}"}} {stats.latency.count}')
+            for name, kind, help_text, attribute in (
+                ('cpl_sql_queries_total', 'counter', 'SQL statements executed, by endpoint.', 'queries'),
+                ('cpl_sql_duration_seconds_total', 'counter', 'Time spent executing SQL, by endpoint.', 'query_seconds'),
+                ('cpl_template_render_seconds_total', 'counter', 'Time spent rendering templates, by endpoint.', 'render_seconds'),
+                ('cpl_n_plus_one_requests_total', 'counter', 'Requests that repeated one SQL statement at least the N+1 threshold.', 'n_plus_one'),
+                ('cpl_response_rendered_bytes_total', 'counter', 'Response body bytes as rendered, by endpoint (unstreamed responses).', 'bytes_rendered'),
+                ('cpl_response_sent_bytes_total', 'counter', 'Response body bytes after minification and compression, by endpoint.', 'bytes_sent'),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                lines += [f'{name}{{endpoint="{endpoint}"}} {getattr(stats, attribute)}' for endpoint, stats in routes]
+        lines += ['# HELP cpl_process_start_time_seconds Start time of this worker since the Unix epoch.',
+                  '# TYPE cpl_process_start_time_seconds gauge', f'cpl_process_start_time_seconds {self.started:.3f}']
+        return '\n'.join(lines) + '\n'
+
+
+metrics = RequestMetrics()
@@ -1,11 +1,37 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean, Text, Index, DateTime, Date, UniqueConstraint, func
 from sqlalchemy.orm import relationship
+from flask import current_app
 from flask_login import UserMixin # Import this
 from werkzeug.security import generate_password_hash, check_password_hash # Import these
 
 db = SQLAlchemy()
 
+# A league runs one auction per season; every team, player and auction record belongs to one season
+class League(db.Model):
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    slug = Column(String(50), unique=True, nullable=False)
+    hostname = Column(String(255), unique=True, nullable=True) # Requests for this host are served this league
+
+    seasons = relationship('Season', back_populates='league')
+
+class Season(db.Model):
+    id = Column(Integer, primary_key=True)
+    league_id = Column(Integer, ForeignKey('league.id'), nullable=False, index=True)
+    name = Column(String(50), nullable=False) # e.g. '2025'
+    is_current = Column(Boolean, nullable=False, default=False) # The season the league's pages and auction use
+
+    # Per-season auction settings (were app-wide constants)
+    auction_date = Column(Date, nullable=True)
+    team_purse = Column(Integer, nullable=False, default=10000)
+    team_slots = Column(Integer, nullable=False, default=15)
+    max_players = Column(Integer, nullable=False, default=120)
+    stats_label = Column(String(50), nullable=False, default='Last Season') # Heading for the players' previous-season figures
+
+    league = relationship('League', back_populates='seasons')
+    __table_args__ = (UniqueConstraint('league_id', 'name'),)
+
 # Add UserMixin to the User class
 class User(db.Model, UserMixin):
     id = Column(Integer, primary_key=True)
@@ -16,18 +42,22 @@ class User(db.Model, UserMixin):
     
     # This links a Captain to their team
     team_id = Column(Integer, ForeignKey('team.id'), nullable=True)
+    # Admins and Captains belong to one league; Super Admins (NULL) to all of them
+    league_id = Column(Integer, ForeignKey('league.id'), nullable=True, index=True)
     team = relationship('Team', back_populates='captain')
 
     # New methods for password management
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=current_app.config.get('PASSWORD_HASH_METHOD', 'scrypt'))
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
 class Team(db.Model):
     id = Column(Integer, primary_key=True)
-    team_name = Column(String(100), unique=True, nullable=False)
+    # Nullable only so init_db can add the column to existing databases before backfilling it
+    season_id = Column(Integer, ForeignKey('season.id'), nullable=True, index=True)
+    team_name = Column(String(100), nullable=False)
     captain_name = Column(String(100), nullable=False)
     purse = Column(Integer, default=10000)
     purse_spent = Column(Integer, default=0)
@@ -38,14 +68,17 @@ class Team(db.Model):
     captain = relationship('User', uselist=False, back_populates='team')
     players = relationship('Player', back_populates='team')
 
+    __table_args__ = (UniqueConstraint('season_id', 'team_name'),)
+
 class Player(db.Model):
     id = Column(Integer, primary_key=True)
+    season_id = Column(Integer, ForeignKey('season.id'), nullable=True)
     player_name = Column(String(100), nullable=False)
     # ... other fields ...
     image_filename = Column(String(100), nullable=True, default='default_player.png') # Add this line
     # ... rest of the model ...
     
-    # CPL 2024 Stats
+    # Previous-season stats, headed by Season.stats_label (column names date from the first season)
     cpl_2024_team = Column(String(100))
     cpl_2024_innings = Column(Integer)
     cpl_2024_runs = Column(Integer)
@@ -64,5 +97,74 @@ class Player(db.Model):
     status = Column(String(20), default='Unsold') # 'Unsold', 'Sold'
     sold_price = Column(Integer, default=0)
     
-    team_id = Column(Integer, ForeignKey('team.id'), nullable=True)
-    team = relationship('Team', back_populates='players')
\ No newline at end of file
+    team_id = Column(Integer, ForeignKey('team.id'), nullable=True, index=True)
+    team = relationship('Team', back_populates='players')
+
+    # Every player query is scoped to one season, so the season leads each index.
+    # Sort keys for the keyset-paginated player listing (see player_listing.py); missing stats sort as -1
+    __table_args__ = (
+        Index('ix_player_season_name', season_id, player_name),
+        Index('ix_player_season_status', season_id, status),
+        Index('ix_player_season_sort_runs', season_id, func.coalesce(cpl_2024_runs, -1), id),
+        Index('ix_player_season_sort_sr', season_id, func.coalesce(cpl_2024_sr, -1), id),
+        Index('ix_player_season_sort_wickets', season_id, func.coalesce(overall_wickets, -1), id),
+    )
+
+# One row per season holding the live auction progress shared by every viewer and worker
+class AuctionState(db.Model):
+    id = Column(Integer, primary_key=True)
+    season_id = Column(Integer, ForeignKey('season.id'), nullable=True, unique=True)
+    started = Column(Boolean, nullable=False, default=False)
+    paused = Column(Boolean, nullable=False, default=False)
+    complete = Column(Boolean, nullable=False, default=False)
+    round_complete = Column(Boolean, nullable=False, default=False)
+    round = Column(Integer, nullable=False, default=1)
+    current_player_id = Column(Integer, ForeignKey('player.id'), nullable=True)
+
+    # Pre-shuffled player IDs for the current round ("12,5,7"); draw_position is the next index to pop.
+    # draw_seed is kept so the order can be reproduced for audits.
+    draw_order = Column(Text, nullable=True)
+    draw_position = Column(Integer, nullable=False, default=0)
+    draw_seed = Column(Integer, nullable=True)
+
+    # Highest live bid for the current player (see auctioneer.py); cleared whenever the player changes.
+    # Bids bump bid_version instead of version, so they don't invalidate anything cached per version
+    bid_team_id = Column(Integer, nullable=True)
+    bid_amount = Column(Integer, nullable=True)
+    bid_version = Column(Integer, nullable=False, default=0)
+
+    # Bumped on every transition so concurrent admins/workers can detect stale state
+    version = Column(Integer, nullable=False, default=0)
+    # Bumped only by changes to players/teams (sales, unsold, rounds, resets, imports); keys the page caches,
+    # so drawing, pausing or resuming doesn't throw away pages whose data hasn't changed
+    data_version = Column(Integer, nullable=False, default=0)
+
+# Append-only log of everything that changes auction results; Player/Team columns are its projection
+class AuctionEvent(db.Model):
+    id = Column(Integer, primary_key=True)
+    season_id = Column(Integer, ForeignKey('season.id'), nullable=True)
+    kind = Column(String(20), nullable=False, index=True) # 'sold', 'unsold', 'round_start', 'pause', 'resume', 'reset', 'undo'
+    player_id = Column(Integer, nullable=True)
+    team_id = Column(Integer, nullable=True)
+    amount = Column(Integer, nullable=True) # Sale price
+    round = Column(Integer, nullable=True)
+    ref_event_id = Column(Integer, nullable=True, index=True) # For 'undo': the sale being reversed
+    detail = Column(Text, nullable=True) # JSON extras, e.g. the purse/slots a reset restored
+    actor = Column(String(50), nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_auction_event_season_id', season_id, id), # Catch-up reads: a season's events after some id
+        Index('ix_auction_event_season_kind', season_id, kind), # Latest reset/sale of a season
+    )
+
+# Projection of Player/Team auction columns as of event_id, so a rebuild only replays later events
+class LedgerSnapshot(db.Model):
+    id = Column(Integer, primary_key=True)
+    season_id = Column(Integer, ForeignKey('season.id'), nullable=True)
+    event_id = Column(Integer, nullable=False)
+    players = Column(Text, nullable=False) # JSON {player_id: [status, sold_price, team_id]}
+    teams = Column(Text, nullable=False) # JSON {team_id: [purse, purse_spent, players_taken_count, slots_remaining]}
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (Index('ix_ledger_snapshot_season_event', season_id, event_id),)
@@ -0,0 +1,95 @@
+import datetime
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+import auction_state
+from tenancy import tenancy
+
+
+class CachedPage:
+    __slots__ = ('body', 'mimetype', 'etag', 'last_modified', 'encoded')
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.encoded = {} # Content-Encoding -> minified/compressed body, filled in by compression.py
+        self.mimetype = mimetype
+        self.etag = hashlib.md5(body).hexdigest()
+        self.last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+
+
+class PageCache:
+    """Small thread-safe LRU of rendered pages.
+
+    Keys include the league season and its auction ``data_version``, so every write
+    that changes players or teams (sold, unsold, round changes, reset, imports) makes
+    the old entries unreachable and they simply age out of the LRU. Draws, pauses and
+    live bids don't touch that version, so they keep the cached pages.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = PageCache()
+
+
+def audience():
+    # Pages only differ by login state and role (nav links, admin columns), never by the individual user
+    if not current_user.is_authenticated:
+        return 'anonymous'
+    return current_user.role
+
+
+def cached_page(per_day=False):
+    """Serve a GET view from the page cache with ETag/Last-Modified revalidation.
+
+    Place below ``login_required``/``role_required`` so access checks still run.
+    ``per_day`` adds today's date to the key for pages with day-based content.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Pending flash messages are rendered into the page, so those responses are never shared
+            if not current_app.config['PAGE_CACHE_ENABLED'] or request.method != 'GET' or session.get('_flashes'):
+                return f(*args, **kwargs)
+            key = (request.endpoint, tuple(sorted(kwargs.items())), audience(), tenancy.current().id,
+                   auction_state.get_snapshot().data_version, datetime.date.today() if per_day else None)
+            entry = cache.get(key)
+            if entry is None:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                entry = CachedPage(response.get_data(), response.mimetype)
+                cache.set(key, entry)
+            response = current_app.response_class(entry.body, mimetype=entry.mimetype)
+            response.set_etag(entry.etag)
+            response.last_modified = entry.last_modified
+            response.headers['Cache-Control'] = 'no-cache' if key[2] == 'anonymous' else 'private, no-cache'
+            response.vary.add('Cookie')
+            response.page_cache_entry = entry
+            return response.make_conditional(request)
+        return decorated_function
+    return decorator
@@ -0,0 +1,74 @@
+import base64
+import json
+from sqlalchemy import and_, or_, func
+from models import Player
+from tenancy import tenancy
+
+# ?sort= values and the expression each one orders by; stats use the indexed coalesce() expressions
+SORTS = {
+    'name': Player.player_name,
+    'runs': func.coalesce(Player.cpl_2024_runs, -1),
+    'sr': func.coalesce(Player.cpl_2024_sr, -1),
+    'wickets': func.coalesce(Player.overall_wickets, -1),
+}
+# JSON type(s) of each sort's cursor value
+SORT_VALUE_TYPES = {'name': (str,), 'runs': (int,), 'sr': (int, float), 'wickets': (int,)}
+STATUS_FILTERS = ('all', 'sold', 'unsold')
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# Fields returned for each player by /api/players
+PLAYER_FIELDS = (
+    'id', 'player_name', 'status', 'team_id', 'sold_price', 'image_filename',
+    'cpl_2024_team', 'cpl_2024_innings', 'cpl_2024_runs', 'cpl_2024_average', 'cpl_2024_sr', 'cpl_2024_hs',
+    'overall_matches', 'overall_runs', 'overall_wickets', 'overall_bat_avg', 'overall_bowl_avg',
+)
+
+
+class InvalidListing(ValueError):
+    """Raised for bad listing parameters; the message is returned to the client."""
+
+
+def encode_cursor(value, player_id):
+    return base64.urlsafe_b64encode(json.dumps([value, player_id]).encode()).decode()
+
+
+def decode_cursor(cursor, sort):
+    # A cursor from another sort (or a hand-made one) must not reach the keyset comparison
+    try:
+        value, player_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        player_id = int(player_id)
+    except (ValueError, TypeError):
+        raise InvalidListing('Invalid cursor.')
+    if isinstance(value, bool) or not isinstance(value, SORT_VALUE_TYPES[sort]):
+        raise InvalidListing(f'Cursor does not match sort "{sort}".')
+    return value, player_id
+
+
+def player_page(status='all', team_id=None, sort='name', descending=False, limit=DEFAULT_LIMIT, cursor=None):
+    """Return ``(players, next_cursor)`` for one page of the current season's player listing.
+
+    Keyset pagination: the cursor holds the (sort value, id) of the last row sent, and
+    the next page starts strictly after it, so every page costs the same however deep
+    the client scrolls.
+    """
+    if sort not in SORTS: raise InvalidListing(f'Unknown sort "{sort}".')
+    if status not in STATUS_FILTERS: raise InvalidListing(f'Unknown status "{status}".')
+    limit = max(1, min(limit, MAX_LIMIT))
+    sort_key = SORTS[sort]
+    query = Player.query.filter(Player.season_id == tenancy.current().id)
+    if status == 'sold': query = query.filter(Player.status == 'Sold')
+    elif status == 'unsold': query = query.filter(Player.status != 'Sold') # Includes 'Round N Unsold'
+    if team_id is not None: query = query.filter(Player.team_id == team_id)
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        if descending: query = query.filter(or_(sort_key < value, and_(sort_key == value, Player.id < last_id)))
+        else: query = query.filter(or_(sort_key > value, and_(sort_key == value, Player.id > last_id)))
+    order = (sort_key.desc(), Player.id.desc()) if descending else (sort_key.asc(), Player.id.asc())
+    rows = query.add_columns(sort_key).order_by(*order).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1][1], rows[limit - 1][0].id) if len(rows) > limit else None
+    return [player for player, _ in rows[:limit]], next_cursor
+
+
+def player_json(player):
+    return {field: getattr(player, field) for field in PLAYER_FIELDS}
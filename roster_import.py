@@ -0,0 +1,170 @@
+import csv
+import io
+import zipfile
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Player
+from exports import PLAYER_COLUMNS, player_headers
+from tenancy import tenancy
+import auction_state
+import ledger
+
+# Importable Player columns and their types; auction results (status, price, team) are never imported
+FIELD_TYPES = {
+    'player_name': str,
+    'image_filename': str,
+    'cpl_2024_team': str,
+    'cpl_2024_innings': int,
+    'cpl_2024_runs': int,
+    'cpl_2024_average': float,
+    'cpl_2024_sr': float,
+    'cpl_2024_hs': int,
+    'overall_matches': int,
+    'overall_runs': int,
+    'overall_wickets': int,
+    'overall_bat_avg': float,
+    'overall_bowl_avg': float,
+}
+# Headers may be column names or the export's headers, so an exported sheet can be re-imported;
+# exports made before seasons had their own stats label are headed "CPL 2024 ..."
+LEGACY_STATS_LABEL = 'CPL 2024'
+# Longest value each text column holds, and the range of an INTEGER column (32-bit on PostgreSQL)
+MAX_LENGTHS = {field: Player.__table__.c[field].type.length for field, kind in FIELD_TYPES.items() if kind is str}
+INT_RANGE = (-2 ** 31, 2 ** 31 - 1)
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 50
+
+
+class UnreadableFile(ValueError):
+    """Raised when an upload can't be parsed as CSV/XLSX; the message is shown to the admin."""
+
+
+class ImportReport:
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = [] # (row number, message), capped at MAX_REPORTED_ERRORS
+
+    def error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+    @property
+    def committed(self):
+        return not self.dry_run and not self.error_count
+
+
+def iter_rows(stream, filename):
+    """Yield (row number, {header: value}) one row at a time from a CSV or XLSX upload."""
+    if filename.lower().endswith('.xlsx'):
+        from openpyxl import load_workbook # Deferred: only imports pay for openpyxl
+        from openpyxl.utils.exceptions import InvalidFileException
+        try:
+            workbook = load_workbook(stream, read_only=True, data_only=True)
+            try:
+                rows = workbook.worksheets[0].iter_rows(values_only=True)
+                headers = [str(value).strip() if value is not None else '' for value in next(rows, ())]
+                for number, values in enumerate(rows, start=2):
+                    if any(value not in (None, '') for value in values):
+                        yield number, dict(zip(headers, values))
+            finally:
+                workbook.close()
+        except (InvalidFileException, zipfile.BadZipFile, KeyError, EOFError) as e: # Read-only workbooks parse lazily
+            raise UnreadableFile(f'Could not read file: {e}') from e
+    elif filename.lower().endswith('.csv'):
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        try:
+            for number, row in enumerate(reader, start=2):
+                if any((value or '').strip() for value in row.values() if isinstance(value, str)):
+                    yield number, row
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise UnreadableFile(f'Could not read file: {e}') from e
+    else:
+        raise ValueError('Upload a .csv or .xlsx file.')
+
+
+def header_aliases(stats_label):
+    """Lower-cased header -> Player column for a season whose stats are headed ``stats_label``."""
+    aliases = {name: name for name in FIELD_TYPES}
+    for label in (LEGACY_STATS_LABEL, stats_label):
+        aliases.update({header.lower(): attribute for header, (_, attribute) in zip(player_headers(label), PLAYER_COLUMNS) if attribute in FIELD_TYPES})
+    return aliases
+
+
+def validate(row, aliases):
+    """Map one raw row onto Player columns; returns (mapping, error message or None)."""
+    mapping = {}
+    for header, raw in row.items():
+        field = aliases.get((header or '').strip().lower())
+        if field is None:
+            continue # Unknown columns are ignored
+        if raw is None or (isinstance(raw, str) and not raw.strip()):
+            mapping[field] = None; continue
+        try:
+            value = raw.strip() if isinstance(raw, str) else raw
+            if FIELD_TYPES[field] is int: value = int(float(value)) if float(value).is_integer() else int(value)
+            elif FIELD_TYPES[field] is float: value = float(value)
+            else: value = str(value)
+        except (ValueError, TypeError, OverflowError):
+            return None, f'"{header}" must be a {FIELD_TYPES[field].__name__}, got "{raw}".'
+        # Checked here so a bad cell is reported against its row instead of failing the batch in the database
+        if field in MAX_LENGTHS and len(value) > MAX_LENGTHS[field]:
+            return None, f'"{header}" is longer than {MAX_LENGTHS[field]} characters.'
+        if FIELD_TYPES[field] is int and not INT_RANGE[0] <= value <= INT_RANGE[1]:
+            return None, f'"{header}" is out of range, got "{raw}".'
+        mapping[field] = value
+    if not mapping.get('player_name'):
+        return None, 'Missing player name.'
+    return mapping, None
+
+
+def import_players(stream, filename, dry_run=False, actor=None):
+    """Stream, validate and upsert the current season's players (matched by name) in one transaction.
+
+    Rows are written in batches of BATCH_SIZE with bulk inserts/updates, so only one
+    batch is held in memory. Blank cells leave an existing player's value as it is, so
+    a partial sheet can't wipe stats. Any invalid row rolls the whole import back; a dry run
+    validates and counts without writing. Returns an ImportReport.
+    """
+    report = ImportReport(dry_run)
+    season = tenancy.current()
+    aliases = header_aliases(season.stats_label)
+    existing = {name: player_id for player_id, name in db.session.query(Player.id, Player.player_name).filter(Player.season_id == season.id)}
+    seen = set(); inserts = []; updates = []
+
+    def flush():
+        if not dry_run and not report.error_count:
+            if inserts: db.session.bulk_insert_mappings(Player, inserts)
+            if updates: db.session.bulk_update_mappings(Player, updates)
+        inserts.clear(); updates.clear()
+
+    try:
+        for number, row in iter_rows(stream, filename):
+            report.rows += 1
+            mapping, error = validate(row, aliases)
+            if error: report.error(number, error); continue
+            name = mapping['player_name']
+            if name in seen: report.error(number, f'Duplicate player "{name}" in file.'); continue
+            seen.add(name)
+            if name in existing:
+                updates.append(dict({field: value for field, value in mapping.items() if value is not None}, id=existing[name])); report.updated += 1
+            else:
+                inserts.append(dict(mapping, season_id=season.id, status='Unsold', sold_price=0)); report.inserted += 1
+            if len(inserts) + len(updates) >= BATCH_SIZE: flush()
+        flush()
+    except ValueError as e: # Unsupported or unreadable file
+        report.error(0, str(e))
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        report.error(0, f'The database rejected the import, nothing was saved: {getattr(e, "orig", None) or e}')
+    if not report.committed:
+        db.session.rollback()
+        return report
+    # Invalidate cached pages and stats, and leave an audit trail in the ledger
+    auction_state.touch()
+    ledger.record('import', actor=actor, detail={'inserted': report.inserted, 'updated': report.updated})
+    db.session.commit()
+    return report
@@ -0,0 +1,41 @@
+from sqlalchemy import update
+from models import db, Player, Team
+from tenancy import tenancy
+
+
+class SaleRejected(Exception):
+    """Raised when a sale can no longer be applied; the message is safe to flash to the admin."""
+
+
+def apply_sale(player_id, team_id, sold_price):
+    """Sell a player to a team inside the caller's transaction.
+
+    Both UPDATEs carry their precondition in the WHERE clause, so the database's row
+    locks serialise concurrent sales across workers: a zero rowcount means another
+    request got there first and the caller must roll back. Rows are always locked
+    player first, then team, so two sales can never deadlock each other. Both rows
+    must belong to the current league season.
+    """
+    season_id = tenancy.current().id
+    if sold_price < 0:
+        raise SaleRejected('Invalid team or price.')
+    claimed = db.session.execute(
+        update(Player)
+        .where(Player.id == player_id, Player.season_id == season_id, Player.status == 'Unsold')
+        .values(status='Sold', sold_price=sold_price, team_id=team_id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if claimed != 1:
+        raise SaleRejected('This player is not currently up for auction or action already taken.')
+    charged = db.session.execute(
+        update(Team)
+        .where(Team.id == team_id, Team.season_id == season_id, Team.slots_remaining > 0, Team.purse >= sold_price)
+        .values(purse=Team.purse - sold_price, purse_spent=Team.purse_spent + sold_price,
+                players_taken_count=Team.players_taken_count + 1, slots_remaining=Team.slots_remaining - 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if charged != 1:
+        team = db.session.query(Team).populate_existing().filter_by(id=team_id, season_id=season_id).first()
+        if team is None: raise SaleRejected('Invalid team or price.')
+        if team.slots_remaining <= 0: raise SaleRejected(f'{team.team_name} has no remaining slots!')
+        raise SaleRejected(f'{team.team_name} does not have enough purse (Remaining: {team.purse})!')
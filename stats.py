@@ -0,0 +1,150 @@
+import math
+import threading
+from array import array
+from models import db, AuctionEvent, Player, Team
+from tenancy import tenancy
+import auction_state
+
+# Leaderboard name -> Player column
+LEADERBOARD_STATS = {
+    'runs': 'cpl_2024_runs',
+    'average': 'cpl_2024_average',
+    'sr': 'cpl_2024_sr',
+    'overall_runs': 'overall_runs',
+    'wickets': 'overall_wickets',
+}
+# Layout of each team's totals array
+T_PLAYERS, T_SPENT, T_RUNS, T_OVERALL_RUNS, T_WICKETS, T_SR_SUM, T_SR_COUNT = range(7)
+NAN = float('nan')
+
+
+def _value(value):
+    return NAN if value is None else float(value)
+
+
+class StatsBoard:
+    """Squad totals per team and global leaderboards, held in flat arrays indexed by player slot.
+
+    Player stats don't change during an auction, so leaderboard orderings are sorted
+    once at load. Only ownership changes, and those arrive as ledger events: a sale
+    adds the player's numbers to one team's totals, an undo subtracts them. Each
+    worker catches up by reading just the events it hasn't applied yet, and only
+    when the auction's data version has moved. There is one board per league season.
+    """
+
+    def __init__(self, season_id):
+        self.season_id = season_id
+        self._lock = threading.Lock()
+        self.version = None
+        self.last_event_id = -1
+
+    def _load(self):
+        self.last_event_id = db.session.query(db.func.max(AuctionEvent.id)).filter(AuctionEvent.season_id == self.season_id).scalar() or 0
+        self.team_names = {team_id: name for team_id, name in db.session.query(Team.id, Team.team_name).filter(Team.season_id == self.season_id)}
+        self.team_totals = {team_id: array('d', [0.0] * 7) for team_id in self.team_names}
+        rows = db.session.query(Player.id, Player.player_name, Player.team_id, Player.sold_price,
+                                *[getattr(Player, column) for column in LEADERBOARD_STATS.values()]).filter(Player.season_id == self.season_id).order_by(Player.id).all()
+        self.player_ids = array('l', [row[0] for row in rows])
+        self.names = [row[1] for row in rows]
+        self.slot_of = {player_id: slot for slot, player_id in enumerate(self.player_ids)}
+        self.owner = array('l', [0] * len(rows))
+        self.price = array('l', [0] * len(rows))
+        self.columns = {stat: array('d', [_value(row[4 + i]) for row in rows]) for i, stat in enumerate(LEADERBOARD_STATS)}
+        # Best first; players without the stat are left off the board
+        self.rankings = {stat: array('l', sorted((slot for slot, value in enumerate(values) if not math.isnan(value)), key=lambda slot, values=values: -values[slot]))
+                         for stat, values in self.columns.items()}
+        for slot, row in enumerate(rows):
+            if row[2] is not None: self._assign(slot, row[2], row[3] or 0)
+
+    def _assign(self, slot, team_id, price, sign=1):
+        totals = self.team_totals.get(team_id)
+        if totals is None:
+            return
+        self.owner[slot] = team_id if sign > 0 else 0
+        self.price[slot] = price if sign > 0 else 0
+        totals[T_PLAYERS] += sign
+        totals[T_SPENT] += sign * price
+        for index, stat in ((T_RUNS, 'runs'), (T_OVERALL_RUNS, 'overall_runs'), (T_WICKETS, 'wickets')):
+            value = self.columns[stat][slot]
+            if not math.isnan(value): totals[index] += sign * value
+        sr = self.columns['sr'][slot]
+        if not math.isnan(sr):
+            totals[T_SR_SUM] += sign * sr; totals[T_SR_COUNT] += sign
+
+    def _apply(self, event):
+        """Apply one ledger event; returns False when a full reload is needed instead."""
+        if event.kind in ('sold', 'undo'):
+            slot = self.slot_of.get(event.player_id)
+            if slot is None or event.team_id not in self.team_totals:
+                return False # Player/team added since the board was loaded
+            # Both are no-ops when the rows already reflect them: _load reads the last event id before the
+            # players, so a sale or undo committed in between is both loaded and then replayed here
+            if event.kind == 'sold':
+                if not self.owner[slot]: self._assign(slot, event.team_id, event.amount)
+            elif self.owner[slot] == event.team_id: self._assign(slot, event.team_id, event.amount, sign=-1)
+        elif event.kind == 'reset':
+            for totals in self.team_totals.values(): totals[:] = array('d', [0.0] * 7)
+            self.owner = array('l', [0] * len(self.player_ids)); self.price = array('l', [0] * len(self.player_ids))
+        elif event.kind not in ('unsold', 'round_start', 'pause', 'resume'):
+            return False # e.g. roster imports
+        self.last_event_id = event.id
+        return True
+
+    def current(self):
+        """Bring the board up to date with the ledger (cheap when nothing changed) and return it."""
+        version = auction_state.get_snapshot().data_version
+        if version == self.version:
+            return self
+        with self._lock:
+            if version != self.version:
+                if self.last_event_id < 0:
+                    self._load()
+                else:
+                    events = AuctionEvent.query.filter(AuctionEvent.season_id == self.season_id, AuctionEvent.id > self.last_event_id)
+                    for event in events.order_by(AuctionEvent.id):
+                        if not self._apply(event):
+                            self._load(); break
+                self.version = version
+        return self
+
+    # --- Read side ---
+    def team_summary(self):
+        summary = {}
+        with self._lock:
+            for team_id, totals in self.team_totals.items():
+                runs = totals[T_RUNS]
+                summary[team_id] = {
+                    'team_id': team_id, 'team_name': self.team_names[team_id],
+                    'players': int(totals[T_PLAYERS]), 'purse_spent': int(totals[T_SPENT]),
+                    'runs': int(runs), 'overall_runs': int(totals[T_OVERALL_RUNS]), 'wickets': int(totals[T_WICKETS]),
+                    'avg_sr': round(totals[T_SR_SUM] / totals[T_SR_COUNT], 2) if totals[T_SR_COUNT] else None,
+                    'spend_per_run': round(totals[T_SPENT] / runs, 2) if runs else None,
+                }
+        return summary
+
+    def leaderboard(self, stat, limit=10, status='all'):
+        """Top ``limit`` players for ``stat``; ``status`` 'sold'/'unsold' filters by current ownership."""
+        results = []
+        with self._lock:
+            values = self.columns[stat]
+            for slot in self.rankings[stat]:
+                owner = self.owner[slot]
+                if (status == 'sold' and not owner) or (status == 'unsold' and owner): continue
+                results.append({'player_id': self.player_ids[slot], 'player_name': self.names[slot], 'value': values[slot],
+                                'team_id': owner or None, 'team_name': self.team_names.get(owner), 'sold_price': self.price[slot]})
+                if len(results) >= limit: break
+        return results
+
+
+_boards = {} # season id -> StatsBoard
+_boards_lock = threading.Lock()
+
+
+def current():
+    """The up-to-date StatsBoard for the current league season."""
+    season_id = tenancy.current().id
+    board = _boards.get(season_id)
+    if board is None:
+        with _boards_lock:
+            board = _boards.setdefault(season_id, StatsBoard(season_id))
+    return board.current()
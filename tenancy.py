@@ -0,0 +1,109 @@
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request, session
+from models import db, League, Season
+
+
+class UnknownLeague(LookupError):
+    """Raised when a league slug doesn't exist or no league has a current season."""
+
+
+class SeasonContext:
+    """A league's current season and its auction settings, detached from the database."""
+    __slots__ = ('id', 'name', 'title', 'league_id', 'league_name', 'league_slug', 'auction_date',
+                 'team_purse', 'team_slots', 'max_players', 'stats_label')
+
+    def __init__(self, season, league):
+        self.id = season.id
+        self.name = season.name
+        self.title = f'{league.slug.upper()} {season.name}' # e.g. "CPL 2025", for page titles and file names
+        self.league_id = league.id
+        self.league_name = league.name
+        self.league_slug = league.slug
+        self.auction_date = season.auction_date
+        self.team_purse = season.team_purse
+        self.team_slots = season.team_slots
+        self.max_players = season.max_players
+        self.stats_label = season.stats_label
+
+
+class Tenancy:
+    """Works out which league season each request belongs to.
+
+    A league with a ``hostname`` is always served on that host. Other hosts serve the
+    league picked at /leagues/<slug> (kept in the session), else DEFAULT_LEAGUE, else
+    the first league. The league/season table is cached per worker for
+    LEAGUE_CACHE_TTL seconds, so resolving a request normally costs no query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._by_slug = {}
+        self._by_host = {}
+
+    def init_app(self, app):
+        self.ttl = app.config['LEAGUE_CACHE_TTL']
+        self.default_slug = app.config['DEFAULT_LEAGUE']
+
+    def _table(self):
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at >= self.ttl:
+            rows = (db.session.query(Season, League).join(League, Season.league_id == League.id)
+                    .filter(Season.is_current.is_(True)).order_by(League.id).all())
+            by_slug = {league.slug: SeasonContext(season, league) for season, league in rows}
+            by_host = {league.hostname.lower(): by_slug[league.slug] for _, league in rows if league.hostname}
+            with self._lock:
+                self._by_slug, self._by_host, self._loaded_at = by_slug, by_host, now
+        return self._by_slug, self._by_host
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def leagues(self):
+        """Every league's current season, in league order."""
+        return list(self._table()[0].values())
+
+    def resolve(self, slug=None, host=None):
+        by_slug, by_host = self._table()
+        if host in by_host: return by_host[host]
+        if slug in by_slug: return by_slug[slug]
+        if self.default_slug in by_slug: return by_slug[self.default_slug]
+        if by_slug: return next(iter(by_slug.values()))
+        raise UnknownLeague('No league has a current season; run `flask init-db` or `flask create-league`.')
+
+    def host_bound(self):
+        # True when the request's host pins its league, so the league switcher doesn't apply
+        return has_request_context() and self._host() in self._table()[1]
+
+    def _host(self):
+        return request.host.rsplit(':', 1)[0].lower()
+
+    def current(self):
+        """The SeasonContext for this request (or for the enclosing ``use`` block)."""
+        season = g.get('season')
+        if season is None:
+            if has_request_context():
+                season = self.resolve(session.get('league'), self._host())
+            else:
+                season = self.resolve()
+            g.season = season
+        return season
+
+    @contextmanager
+    def use(self, slug=None):
+        """Run CLI or background code in a league's current season (the default league if ``slug`` is None)."""
+        if slug is not None and slug not in self._table()[0]:
+            raise UnknownLeague(f'Unknown league "{slug}".')
+        previous = g.pop('season', None)
+        g.season = self.resolve(slug)
+        try:
+            yield g.season
+        finally:
+            g.pop('season', None)
+            if previous is not None: g.season = previous
+
+
+tenancy = Tenancy()